@@ -0,0 +1,217 @@
+import asyncio
+import logging
+import os
+import threading
+from datetime import datetime
+
+from fastjson import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+# Document fields stored as datetimes, restored from their ISO strings on replay
+DATETIME_FIELDS = ("created_at",)
+# Bytes read from the end of the log at a time when looking for the last complete record
+TAIL_CHUNK_SIZE = 64 * 1024
+
+
+def _resolve(future, error):
+    if future.done():  # the request was cancelled while waiting
+        return
+    if error is None:
+        future.set_result(None)
+    else:
+        future.set_exception(error)
+
+
+class AuditLog:
+    """Append-only NDJSON log of player and budget mutations, written with group commit.
+
+    `append()` returns once its events are on disk. A single writer thread takes
+    everything queued since its last write and writes it with one fsync, so
+    concurrent requests share an fsync instead of paying for one each, and a
+    burst of writes costs barely more than a single one.
+    """
+
+    def __init__(self, path, fsync=True):
+        self.path = path
+        self.fsync = fsync
+        self.sequence = 0
+        self.writes = 0
+        self._pending = []
+        self._condition = threading.Condition()
+        self._closing = False
+        self._thread = None
+        self._file = None
+
+    @property
+    def enabled(self):
+        return bool(self.path)
+
+    def open(self):
+        """Recover the last sequence number (dropping a torn final record) and start the writer thread"""
+        if not self.enabled or self._thread is not None:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, "a+b")
+        self.sequence = self._recover()
+        self._closing = False
+        self._thread = threading.Thread(target=self._run, name="audit-log-writer", daemon=True)
+        self._thread.start()
+
+    def _recover(self):
+        file = self._file
+        end = file.seek(0, os.SEEK_END)
+        position, tail = end, b""
+        while position > 0 and tail.count(b"\n") < 2:
+            step = min(TAIL_CHUNK_SIZE, position)
+            position -= step
+            file.seek(position)
+            tail = file.read(step) + tail
+        if tail and not tail.endswith(b"\n"):
+            # A crash in the middle of a write: the record was never acknowledged, drop it
+            complete = tail.rfind(b"\n") + 1
+            logger.warning("Truncating %d bytes of a torn record at the end of %s", len(tail) - complete, self.path)
+            file.truncate(position + complete)
+            tail = tail[:complete]
+        lines = tail.splitlines()
+        return loads(lines[-1])["seq"] if lines else 0
+
+    async def append(self, *events):
+        """Log `events` (in order) and wait until they are durable"""
+        if not self.enabled or not events:
+            return
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._condition:
+            if self._thread is None:
+                raise RuntimeError("Audit log is not open")
+            at = datetime.utcnow().isoformat(timespec="microseconds")
+            lines = []
+            for event in events:
+                self.sequence += 1
+                lines.append(dumps({"seq": self.sequence, "at": at, **event}))
+            lines.append(b"")
+            self._pending.append((b"\n".join(lines), future, loop))
+            self._condition.notify()
+        await future
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closing:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+                batch, self._pending = self._pending, []
+            error = None
+            try:
+                self._file.write(b"".join(chunk for chunk, _, _ in batch))
+                self._file.flush()
+                if self.fsync:
+                    os.fsync(self._file.fileno())
+                self.writes += 1
+            except Exception as e:
+                logger.error("Audit log write failed: %s", e)
+                error = e
+            for _, future, loop in batch:
+                loop.call_soon_threadsafe(_resolve, future, error)
+
+    def close(self):
+        """Write whatever is queued and stop the writer thread"""
+        if self._thread is None:
+            return
+        with self._condition:
+            self._closing = True
+            self._condition.notify()
+        self._thread.join()
+        self._thread = None
+        self._file.close()
+        self._file = None
+
+
+def read_events(paths, until=None, league_id=None):
+    """Yield logged events in order, stopping at the first one logged after `until` (naive UTC)"""
+    bound = until.isoformat(timespec="microseconds") if until is not None else None
+    for path in paths:
+        with open(path, "rb") as file:
+            for line in file:
+                try:
+                    event = loads(line)
+                except ValueError:
+                    if line.strip():
+                        logger.warning("Skipping an unreadable record in %s", path)
+                    continue
+                if bound is not None and event["at"] > bound:
+                    return
+                if league_id is not None and event.get("league_id") != league_id:
+                    continue
+                yield event
+
+
+def _restore(document):
+    for field in DATETIME_FIELDS:
+        if field in document:
+            document[field] = _timestamp(document[field])
+    return document
+
+
+def _timestamp(value):
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _compact(budgets, league_id, through_version, before):
+    """Drop the versions a logged compaction removed, with the bounds BudgetHistory.compact used"""
+    before = _timestamp(before)
+    for key, budget in list(budgets.items()):
+        if key[0] != league_id or budget["version"] > through_version:
+            continue
+        created_at = _timestamp(budget.get("created_at"))
+        if before is None or (created_at is not None and created_at < before):
+            del budgets[key]
+
+
+def logged_documents(events):
+    """Keys of every document the events write: ({(league_id, player_id)}, {(league_id, budget version)})"""
+    players, budgets = set(), set()
+    for event in events:
+        kind, league_id = event.get("type"), event.get("league_id")
+        if kind == "player":
+            players.add((league_id, event["id"] if event["op"] == "deleted" else event["player"]["id"]))
+        elif kind == "budget" and event["op"] != "compacted":
+            budgets.add((league_id, event["budget"]["version"]))
+    return players, budgets
+
+
+def replay(events):
+    """Fold events into the state they leave behind.
+
+    Returns {"players": {(league_id, player_id): player}, "budgets": {(league_id, version): budget},
+    "leagues": leagues touched, "events": events applied}. Budget versions are kept until a logged
+    compaction removes them, as in the budgets collection; the highest one is current.
+    """
+    players = {}
+    budgets = {}
+    leagues = set()
+    count = 0
+    for event in events:
+        count += 1
+        kind = event.get("type")
+        league_id = event.get("league_id")
+        leagues.add(league_id)
+        if kind == "player":
+            if event["op"] == "deleted":
+                players.pop((league_id, event["id"]), None)
+            else:
+                player = event["player"]
+                players[(league_id, player["id"])] = player
+        elif kind == "budget":
+            if event["op"] == "compacted":
+                _compact(budgets, league_id, event["through_version"], event.get("before"))
+            else:
+                budget = event["budget"]
+                budgets[(league_id, budget["version"])] = budget
+    # Only the surviving documents need their datetimes parsed
+    for document in list(players.values()) + list(budgets.values()):
+        _restore(document)
+    return {"players": players, "budgets": budgets, "leagues": leagues, "events": count}
@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta
+
+from pymongo import ASCENDING, DESCENDING, IndexModel, ReturnDocument, UpdateOne
+
+BUDGET_HISTORY_INDEXES = [
+    # Point lookups of a given version, and version-ordered listing and compaction
+    IndexModel([("league_id", ASCENDING), ("version", DESCENDING)], name="league_version_unique", unique=True),
+]
+BUDGET_HEAD_INDEXES = [
+    IndexModel([("league_id", ASCENDING)], name="league_unique", unique=True),
+]
+
+
+class BudgetHistory:
+    """Versioned budget configurations with an O(1) pointer to the current one.
+
+    Every save is appended to the history collection with the next version of
+    its league. A head document per league holds the version counter and a copy
+    of the current budget, so reading the current budget is a single unique-index
+    lookup however long the history grows. Old versions can be compacted away;
+    the current one is never removed.
+
+    `on_compact(league_id, through_version, before, deleted)` is awaited after a
+    compaction removed versions, so the removal can be logged and replayed.
+    """
+
+    def __init__(self, collection, heads_collection, keep_versions=None, keep_days=None, on_compact=None):
+        self.collection = collection
+        self.heads_collection = heads_collection
+        self.keep_versions = keep_versions
+        self.keep_days = keep_days
+        self.on_compact = on_compact
+
+    async def current(self, league_id):
+        head = await self.heads_collection.find_one({"league_id": league_id}, {"_id": 0, "budget": 1})
+        return head.get("budget") if head else None
+
+    async def record(self, budget):
+        """Append `budget` as the league's next version and move the head to it"""
+        league_id = budget["league_id"]
+        head = await self.heads_collection.find_one_and_update(
+            {"league_id": league_id}, {"$inc": {"version": 1}}, projection={"_id": 0, "version": 1},
+            upsert=True, return_document=ReturnDocument.AFTER)
+        budget = {**budget, "version": head["version"]}
+        await self.collection.insert_one(dict(budget))
+        # Concurrent saves may finish out of order: only ever move the head forward
+        await self.heads_collection.update_one(
+            {"league_id": league_id, "$or": [{"budget": None}, {"budget.version": {"$lt": budget["version"]}}]},
+            {"$set": {"budget": budget}})
+        if self.keep_versions:
+            await self.compact(league_id, self.keep_versions, self.keep_days)
+        return budget
+
+    async def version(self, league_id, version):
+        return await self.collection.find_one({"league_id": league_id, "version": version}, {"_id": 0})
+
+    async def at(self, league_id, timestamp):
+        """The budget that was current at `timestamp` (naive UTC), or None if it predates the retained history"""
+        return await self.collection.find_one(
+            {"league_id": league_id, "created_at": {"$lte": timestamp}}, {"_id": 0}, sort=[("created_at", -1)])
+
+    async def versions(self, league_id, limit=50):
+        return await self.collection.find({"league_id": league_id}, {"_id": 0}).sort(
+            "version", -1).limit(limit).to_list(length=None)
+
+    async def compact(self, league_id, keep_versions, keep_days=None):
+        """Drop versions older than the newest `keep_versions` (and than `keep_days`, when given).
+
+        Returns the number of versions removed.
+        """
+        head = await self.heads_collection.find_one({"league_id": league_id}, {"_id": 0, "version": 1})
+        if head is None:
+            return 0
+        through_version = head["version"] - max(1, keep_versions)
+        before = datetime.utcnow() - timedelta(days=keep_days) if keep_days is not None else None
+        query = {"league_id": league_id, "version": {"$lte": through_version}}
+        if before is not None:
+            query["created_at"] = {"$lt": before}
+        result = await self.collection.delete_many(query)
+        if result.deleted_count and self.on_compact is not None:
+            await self.on_compact(league_id, through_version, before, result.deleted_count)
+        return result.deleted_count
+
+    async def ensure(self):
+        """Number budgets saved before versioning by created_at and point each league's head at its latest"""
+        leagues = await self.collection.distinct("league_id", {"version": {"$exists": False}})
+        for league_id in leagues:
+            legacy = await self.collection.find(
+                {"league_id": league_id, "version": {"$exists": False}}, {"_id": 1}).sort(
+                "created_at", 1).to_list(length=None)
+            versioned = await self.collection.find_one(
+                {"league_id": league_id, "version": {"$exists": True}}, {"_id": 0, "version": 1},
+                sort=[("version", -1)])
+            first = (versioned["version"] if versioned else 0) + 1
+            await self.collection.bulk_write(
+                [UpdateOne({"_id": doc["_id"]}, {"$set": {"version": first + index}}) for index, doc in enumerate(legacy)],
+                ordered=False)
+            latest = await self.collection.find_one({"league_id": league_id}, {"_id": 0}, sort=[("version", -1)])
+            await self.heads_collection.update_one(
+                {"league_id": league_id}, {"$set": {"version": latest["version"], "budget": latest}}, upsert=True)
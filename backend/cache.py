@@ -0,0 +1,95 @@
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+
+
+class ReadCache:
+    """In-process cache for read endpoints with explicit invalidation and a TTL fallback.
+
+    Every key carries a generation number that is bumped on invalidation, so a load
+    that started before a write can never store its (stale) result after the write.
+    """
+
+    def __init__(self, ttl_seconds=30.0):
+        self.ttl_seconds = ttl_seconds
+        self._entries = {}
+        self._generations = defaultdict(int)
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    async def get_or_load(self, key, loader):
+        """Return the cached value for `key`, calling `loader()` on a miss or after expiry"""
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is not None and entry[0] > now:
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        generation = self._generations[key]
+        value = await loader()
+        if self._generations[key] == generation:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        return value
+
+    def invalidate(self, *keys):
+        """Drop the given keys"""
+        for key in keys:
+            self._generations[key] += 1
+            self._entries.pop(key, None)
+            self.invalidations += 1
+
+    def clear(self):
+        for key in list(self._generations):
+            self._generations[key] += 1
+        self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+
+class VersionTracker:
+    """Per-collection write counters used to build ETag/Last-Modified validators.
+
+    The boot token makes validators from a previous process (or another worker)
+    never match, since counters restart from zero. Writes this process never sees
+    (another worker, the CLI, manual edits) do not move the counters, so with
+    `max_age_seconds` the ETag also carries the current time window: a client is
+    answered 304 from the same validator for at most that long.
+    """
+
+    def __init__(self, max_age_seconds=None):
+        self.boot_token = uuid.uuid4().hex[:8]
+        self.max_age_seconds = max_age_seconds
+        self._versions = defaultdict(int)
+        started = datetime.now(timezone.utc).replace(microsecond=0)
+        self._modified = defaultdict(lambda: started)
+
+    def bump(self, *collections):
+        now = datetime.now(timezone.utc).replace(microsecond=0)
+        for name in collections:
+            self._versions[name] += 1
+            self._modified[name] = now
+
+    def bump_prefix(self, prefix):
+        """Bump every tracked collection whose name starts with `prefix` (a write of unknown scope)"""
+        self.bump(*[name for name in self._versions if name.startswith(prefix)])
+
+    def etag(self, *collections):
+        versions = "-".join(str(self._versions[name]) for name in collections)
+        if self.max_age_seconds:
+            versions += f"-{int(time.time() // self.max_age_seconds)}"
+        return f'W/"{self.boot_token}-{versions}"'
+
+    def last_modified(self, *collections):
+        return max(self._modified[name] for name in collections)
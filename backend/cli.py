@@ -0,0 +1,196 @@
+import asyncio
+from typing import List
+
+import typer
+
+cli = typer.Typer(help="Fantasy Football Auction Manager maintenance commands")
+
+
+@cli.command("rebuild-ledger")
+def rebuild_ledger(
+    league: str = typer.Option(None, help="Only rebuild this league (default: every league)."),
+):
+    """Rebuild the per-role budget ledger from the players collection."""
+    from server import budget_ledger, open_storage
+
+    open_storage()
+    totals = asyncio.run(budget_ledger.rebuild(league))
+    for league_id, roles in totals.items():
+        typer.echo(f"[{league_id}]")
+        for role, row in roles.items():
+            typer.echo(f"  {role}: spent={row['spent']} max_desired={row['max_desired_total']} "
+                       f"players={row['player_count']} primaries={row['primary_choices_count']}")
+
+
+@cli.command("compact-budgets")
+def compact_budgets(
+    league: str = typer.Option("default", help="League whose budget history is compacted."),
+    keep_versions: int = typer.Option(10, help="Newest versions always kept."),
+    keep_days: float = typer.Option(None, help="Also keep older versions saved within this many days."),
+):
+    """Delete old budget versions, never the current one."""
+    from server import audit_log, budget_history, open_storage
+
+    open_storage()
+    # The compaction is audited like one made through the API
+    audit_log.open()
+    try:
+        deleted = asyncio.run(budget_history.compact(league, keep_versions, keep_days))
+    finally:
+        audit_log.close()
+    typer.echo(f"[{league}] removed {deleted} budget versions")
+
+
+@cli.command("import-stats")
+def import_stats(
+    path: str = typer.Argument(..., help="CSV, JSON or NDJSON file of per-matchday player rows."),
+    season: str = typer.Option(..., help="Season the rows belong to, e.g. 2024-25."),
+    format: str = typer.Option(None, help="csv, json or ndjson (default: from the file extension)."),
+):
+    """Ingest per-matchday player statistics; the matchdays in the file replace the stored ones."""
+    import time
+
+    from server import get_stats_store, iter_bulk_rows
+
+    name = path.lower()
+    file_format = format or ("csv" if name.endswith(".csv") else "ndjson" if name.endswith((".ndjson", ".jsonl"))
+                             else "json")
+    started = time.perf_counter()
+    with open(path, "rb") as stream:
+        report = get_stats_store().ingest(season, iter_bulk_rows(stream, file_format))
+    for error in report["errors"][:20]:
+        typer.echo(f"  row {error['row']}: {'; '.join(error['errors'])}")
+    typer.echo(f"[{season}] ingested {report['ingested']} rows ({report['failed']} failed) in "
+               f"{time.perf_counter() - started:.2f}s; {report['rows']} rows, {report['players']} players, "
+               f"{len(report['matchdays'])} matchdays stored")
+
+
+@cli.command("replay-audit")
+def replay_audit(
+    paths: List[str] = typer.Argument(None, help="Audit log files, oldest first (default: AUDIT_LOG_PATH)."),
+    until: str = typer.Option(None, help="ISO timestamp (UTC unless it has an offset): replay up to this moment."),
+    league: str = typer.Option(None, help="Only replay this league."),
+    output: str = typer.Option(None, help="Write the replayed players and budgets to this JSON file."),
+    apply: bool = typer.Option(False, "--apply", help="Replace the replayed leagues' players and budgets in "
+                                                      "storage with the replayed state. Stop the backend first."),
+    force: bool = typer.Option(False, "--force", help="Apply even though storage holds players or budget versions "
+                                                      "the audit log never recorded (they are deleted)."),
+):
+    """Rebuild players and budgets from the audit log, now or as they were at a point in time."""
+    import time
+    from datetime import datetime
+
+    import server
+    from audit import logged_documents, read_events, replay
+    from fastjson import dumps
+
+    until_at = server.naive_utc(datetime.fromisoformat(until)) if until else None
+    started = time.perf_counter()
+    paths = paths or [server.AUDIT_LOG_PATH]
+    state = replay(read_events(paths, until_at, league))
+    elapsed = time.perf_counter() - started
+    players, budgets, leagues = state["players"], state["budgets"], sorted(state["leagues"])
+    typer.echo(f"Replayed {state['events']} events in {elapsed:.2f}s ({state['events'] / max(elapsed, 1e-9):,.0f} "
+               f"events/s): {len(players)} players, {len(budgets)} budget versions in {len(leagues)} leagues")
+
+    if output:
+        with open(output, "wb") as file:
+            file.write(dumps({"until": until_at, "players": list(players.values()),
+                              "budgets": sorted(budgets.values(), key=lambda b: (b["league_id"], b["version"]))}))
+        typer.echo(f"State written to {output}")
+
+    if apply:
+        server.open_storage()
+
+        async def unlogged():
+            """Stored documents of the replayed leagues that no logged event (at any time) wrote"""
+            logged_players, logged_budgets = logged_documents(read_events(paths, None, league))
+            found = {}
+            for league_id in leagues:
+                stored_players = await server.players_collection.find(
+                    {"league_id": league_id}, {"_id": 0, "id": 1}).to_list(length=None)
+                stored_budgets = await server.budgets_collection.find(
+                    {"league_id": league_id}, {"_id": 0, "version": 1}).to_list(length=None)
+                counts = (sum((league_id, p["id"]) not in logged_players for p in stored_players),
+                          sum((league_id, b.get("version")) not in logged_budgets for b in stored_budgets))
+                if any(counts):
+                    found[league_id] = counts
+            return found
+
+        async def restore():
+            for league_id in leagues:
+                docs = [dict(p) for (owner, _), p in players.items() if owner == league_id]
+                versions = sorted((b for (owner, _), b in budgets.items() if owner == league_id),
+                                  key=lambda b: b["version"])
+                await server.players_collection.delete_many({"league_id": league_id})
+                for start in range(0, len(docs), server.BULK_BATCH_SIZE):
+                    await server.players_collection.insert_many(docs[start:start + server.BULK_BATCH_SIZE])
+                await server.budgets_collection.delete_many({"league_id": league_id})
+                await server.budget_heads_collection.delete_one({"league_id": league_id})
+                if versions:
+                    await server.budgets_collection.insert_many([dict(b) for b in versions])
+                    await server.budget_heads_collection.insert_one(
+                        {"league_id": league_id, "version": versions[-1]["version"], "budget": versions[-1]})
+                await server.budget_ledger.rebuild(league_id)
+                typer.echo(f"[{league_id}] restored {len(docs)} players and {len(versions)} budget versions")
+
+        async def apply_state():
+            found = {} if force else await unlogged()
+            for league_id, (player_count, budget_count) in found.items():
+                typer.echo(f"[{league_id}] storage holds {player_count} players and {budget_count} budget versions "
+                           f"the audit log does not contain")
+            if found:
+                typer.echo("Not applied: --apply would delete them. Re-run with --force to replace them anyway.")
+                return False
+            await restore()
+            return True
+
+        if not asyncio.run(apply_state()):
+            raise typer.Exit(1)
+
+
+@cli.command("simulate")
+def simulate(
+    runs: int = typer.Option(10000, help="Number of simulated auctions."),
+    rivals: int = typer.Option(7, help="Rival managers bidding against us."),
+    model: str = typer.Option("lognormal", help="Rival bidding model: uniform, lognormal or aggressive."),
+    spread: float = typer.Option(0.35, help="Spread of rival valuations around our max desired price."),
+    workers: int = typer.Option(0, help="Worker processes (0 = one per CPU)."),
+    seed: int = typer.Option(0, help="Random seed for reproducible runs."),
+    league: str = typer.Option("default", help="League whose watchlist and budget are simulated."),
+    as_json: bool = typer.Option(False, "--json", help="Print the full report as JSON."),
+):
+    """Monte Carlo auctions against rival bidders using the stored players and budget."""
+    import json
+
+    import server
+    from server import ROLES, get_latest_budget, organize_players_by_role, BudgetConfig
+    from simulator import run_simulation
+
+    server.open_storage()
+
+    async def load():
+        players = await server.players_collection.find({"league_id": league}, {"_id": 0}).to_list(length=None)
+        budget = await get_latest_budget(league) or BudgetConfig(league_id=league).dict()
+        return players, budget
+
+    players, budget = asyncio.run(load())
+    players_by_role = {role: organize_players_by_role([p for p in players if p.get("role") == role]) for role in ROLES}
+    report = run_simulation(players_by_role, budget, runs=runs, rivals=rivals, model=model, spread=spread,
+                            workers=workers or None, seed=seed)
+    if as_json:
+        typer.echo(json.dumps(report, indent=2))
+        return
+
+    typer.echo(f"{runs} auctions, {rivals} rivals, {model} model (spread {spread})")
+    for role, stats in report["roles"].items():
+        over = stats["overspend"]
+        typer.echo(f"\n{role}: allocated {stats['allocated']:.0f}, mean spend {stats['mean_spend']:.1f}")
+        typer.echo(f"  overspend: P(>0)={over['probability']:.1%} mean={over['mean']:.1f} "
+                   f"p50={over['p50']:.1f} p90={over['p90']:.1f} p99={over['p99']:.1f}")
+        for choice in stats["primary_choices"]:
+            typer.echo(f"  {choice['name']}: {choice['landing_probability']:.1%}")
+
+
+if __name__ == "__main__":
+    cli()
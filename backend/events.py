@@ -0,0 +1,107 @@
+import asyncio
+import logging
+
+from fastjson import dumps
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeBroker:
+    """In-process pub/sub of auction changes, fanned out to SSE subscribers.
+
+    Each subscriber owns a bounded queue. A subscriber that falls too far behind
+    has its backlog dropped and receives a single ``resync`` event instead, so a
+    slow browser can never make the publisher block or grow memory unbounded.
+    """
+
+    def __init__(self, queue_size=1000):
+        self.queue_size = queue_size
+        self._subscribers = {}
+        self._listeners = []
+        self._sequence = 0
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def add_listener(self, callback):
+        """Call `callback(event)` synchronously for every published event (in-process consumers)"""
+        self._listeners.append(callback)
+
+    def publish(self, event):
+        """Queue `event` (a JSON-serializable dict) for every subscriber of its league.
+
+        Events without a league_id (a global resync) go to every subscriber.
+        """
+        for callback in self._listeners:
+            try:
+                callback(event)
+            except Exception:
+                logger.exception("Change listener failed")
+        self._sequence += 1
+        message = (self._sequence, dumps(event).decode())
+        league_id = event.get("league_id")
+        for queue, subscribed_league in list(self._subscribers.items()):
+            if league_id is not None and subscribed_league != league_id:
+                continue
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait((self._sequence, dumps({"type": "resync"}).decode()))
+
+    def subscribe(self, league_id):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers[queue] = league_id
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.pop(queue, None)
+
+    async def sse_stream(self, league_id, heartbeat_seconds=15.0):
+        """Server-Sent Events body: one `data:` frame per change, comment pings while idle"""
+        queue = self.subscribe(league_id)
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    sequence, data = await asyncio.wait_for(queue.get(), timeout=heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield f"id: {sequence}\ndata: {data}\n\n"
+        finally:
+            self.unsubscribe(queue)
+
+
+async def watch_mongo_changes(broker, players_collection, budgets_collection):
+    """Feed the broker from Mongo change streams (requires a replica set).
+
+    Used instead of the in-process publishers when several backend processes
+    share one database, so every process sees writes made by the others.
+    """
+    async def watch(collection, kind):
+        pipeline = [{"$match": {"operationType": {"$in": ["insert", "replace", "update", "delete"]}}}]
+        async with collection.watch(pipeline, full_document="updateLookup") as stream:
+            async for change in stream:
+                document = change.get("fullDocument")
+                if document is not None:
+                    document.pop("_id", None)
+                league_id = document.get("league_id") if document is not None else None
+                if kind == "player":
+                    if change["operationType"] == "delete":
+                        # Only the Mongo _id survives a delete; clients resync to drop the row
+                        broker.publish({"type": "resync"})
+                    elif document is not None:
+                        op = "created" if change["operationType"] == "insert" else "updated"
+                        broker.publish({"type": "player", "op": op, "league_id": league_id, "player": document})
+                elif document is not None:
+                    broker.publish({"type": "budget", "op": "updated", "league_id": league_id, "budget": document})
+
+    try:
+        await asyncio.gather(watch(players_collection, "player"), watch(budgets_collection, "budget"))
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.error("Mongo change stream stopped: %s", e)
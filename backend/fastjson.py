@@ -0,0 +1,100 @@
+import gzip
+import json
+from datetime import datetime
+
+from fastapi.responses import JSONResponse, Response
+from starlette.middleware.gzip import GZipMiddleware
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional speedup
+    brotli = None
+
+# Bodies smaller than this are not worth compressing
+COMPRESS_MIN_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value):
+    """Compact JSON bytes; orjson when installed, the standard library otherwise"""
+    if orjson is not None:
+        return orjson.dumps(value, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(value, default=_default, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data):
+    """Parse JSON bytes or text; orjson when installed, the standard library otherwise"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with `dumps` (datetimes as ISO strings, no pretty-printing)"""
+
+    def render(self, content):
+        return dumps(content)
+
+
+def accepted_encodings(request):
+    return {token.split(";")[0].strip().lower() for token in request.headers.get("accept-encoding", "").split(",")}
+
+
+class EncodedJSON:
+    """A JSON body rendered once and served to every cache hit, with lazily compressed variants.
+
+    Caching the bytes instead of the documents means a hit costs neither
+    validation nor serialization nor (after the first hit) compression.
+    """
+
+    __slots__ = ("body", "_compressed")
+
+    def __init__(self, value):
+        self.body = dumps(value)
+        self._compressed = {}
+
+    def _encode(self, encoding):
+        if encoding not in self._compressed:
+            if encoding == "br":
+                self._compressed[encoding] = brotli.compress(self.body, quality=BROTLI_QUALITY)
+            else:
+                self._compressed[encoding] = gzip.compress(self.body, compresslevel=GZIP_LEVEL)
+        return self._compressed[encoding]
+
+    def response(self, request, headers=None):
+        headers = dict(headers or {})
+        body = self.body
+        if len(body) >= COMPRESS_MIN_SIZE:
+            accepted = accepted_encodings(request)
+            encoding = "br" if brotli is not None and "br" in accepted else "gzip" if "gzip" in accepted else None
+            headers["Vary"] = "Accept-Encoding"
+            if encoding:
+                body = self._encode(encoding)
+                headers["Content-Encoding"] = encoding
+        return Response(content=body, media_type="application/json", headers=headers)
+
+
+class SelectiveGZipMiddleware(GZipMiddleware):
+    """GZipMiddleware that leaves some paths alone (e.g. SSE, which must not sit in the compressor's buffer)"""
+
+    def __init__(self, app, exclude_paths=(), **options):
+        super().__init__(app, **options)
+        self.exclude_paths = set(exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
@@ -0,0 +1,126 @@
+from collections import defaultdict
+
+from pymongo import ASCENDING, IndexModel, ReplaceOne
+
+ROLES = ["portiere", "difensore", "centrocampista", "attaccante"]
+DEFAULT_LEAGUE = "default"
+LEDGER_FIELDS = ["spent", "max_desired_total", "player_count", "primary_choices_count"]
+# Ledger fields that count players; kept as integers (the others are credit amounts)
+COUNT_FIELDS = ("player_count", "primary_choices_count")
+
+# Missing is_primary_choice counts as primary, matching the Player model default
+IS_PRIMARY_EXPR = {"$ne": ["$is_primary_choice", False]}
+
+ROLE_TOTALS_PIPELINE = [
+    {"$match": {"role": {"$in": ROLES}}},
+    {"$group": {
+        "_id": {"league_id": "$league_id", "role": "$role"},
+        "spent": {"$sum": "$price_paid"},
+        "max_desired_total": {"$sum": {"$cond": [IS_PRIMARY_EXPR, "$max_desired_price", 0]}},
+        "player_count": {"$sum": 1},
+        "primary_choices_count": {"$sum": {"$cond": [IS_PRIMARY_EXPR, 1, 0]}},
+    }},
+]
+
+LEDGER_INDEXES = [
+    IndexModel([("league_id", ASCENDING), ("role", ASCENDING)], name="league_role_unique", unique=True),
+]
+# Single-league index that would reject the same role in a second league
+OBSOLETE_LEDGER_INDEXES = ["role_unique"]
+# Bumped whenever the row layout changes; ensure() rebuilds every ledger recorded under an older one
+LEDGER_SCHEMA_VERSION = 2
+MIGRATION_NAME = "budget_ledger"
+
+# Fields a player write needs to report so the ledger can be adjusted
+LEDGER_PROJECTION = {"_id": 0, "league_id": 1, "role": 1, "price_paid": 1, "max_desired_price": 1,
+                     "is_primary_choice": 1}
+
+
+def ledger_contribution(player):
+    """What a single player document adds to its role's ledger row"""
+    is_primary = player.get("is_primary_choice", True)
+    return {
+        "spent": player.get("price_paid", 0) or 0,
+        "max_desired_total": (player.get("max_desired_price", 0) or 0) if is_primary else 0,
+        "player_count": 1,
+        "primary_choices_count": 1 if is_primary else 0,
+    }
+
+
+def ledger_deltas(before=(), after=()):
+    """Per-(league, role) $inc deltas turning the `before` player documents into the `after` ones.
+
+    A role change or a primary/backup flip simply shows up as a negative delta on
+    the old contribution and a positive one on the new.
+    """
+    # An int delta keeps the stored counts integers; a float one would turn them into doubles
+    deltas = defaultdict(lambda: {field: 0 if field in COUNT_FIELDS else 0.0 for field in LEDGER_FIELDS})
+    for sign, players in ((-1, before), (1, after)):
+        for player in players:
+            if player is None or player.get("role") not in ROLES:
+                continue
+            key = (player.get("league_id", DEFAULT_LEAGUE), player["role"])
+            for field, value in ledger_contribution(player).items():
+                deltas[key][field] += sign * value
+    return {
+        key: {field: value for field, value in fields.items() if value}
+        for key, fields in deltas.items()
+        if any(fields.values())
+    }
+
+
+class BudgetLedger:
+    """Materialized per-league, per-role totals, kept current with $inc on every player write.
+
+    Player writes and ledger updates are separate operations (multi-document
+    transactions would need a replica set), so `rebuild()` exists to reconcile
+    the ledger from the players collection after a crash or manual edits.
+    """
+
+    def __init__(self, collection, players_collection, migrations_collection=None):
+        self.collection = collection
+        self.players_collection = players_collection
+        self.migrations_collection = migrations_collection
+
+    async def apply(self, before=(), after=()):
+        for (league_id, role), inc in ledger_deltas(before, after).items():
+            await self.collection.update_one({"league_id": league_id, "role": role}, {"$inc": inc}, upsert=True)
+
+    async def totals(self, league_id=DEFAULT_LEAGUE):
+        """{role: row} for every role of the league that has a ledger row"""
+        rows = await self.collection.find({"league_id": league_id}, {"_id": 0}).to_list(length=None)
+        return {row["role"]: row for row in rows}
+
+    async def rebuild(self, league_id=None):
+        """Recompute the rows of one league (or of every league) from the players collection"""
+        pipeline = ROLE_TOTALS_PIPELINE
+        if league_id is not None:
+            pipeline = [{"$match": {"league_id": league_id}}] + pipeline
+        rows = await self.players_collection.aggregate(pipeline).to_list(length=None)
+        computed = {(row["_id"]["league_id"], row["_id"]["role"]): row for row in rows}
+        leagues = {league for league, _ in computed} | ({league_id} if league_id is not None else set())
+        requests = []
+        for league in leagues:
+            for role in ROLES:
+                row = {"league_id": league, "role": role}
+                row.update({field: computed.get((league, role), {}).get(field, 0) for field in LEDGER_FIELDS})
+                requests.append(ReplaceOne({"league_id": league, "role": role}, row, upsert=True))
+        if league_id is None:
+            # Leagues whose players are all gone keep no stale rows
+            await self.collection.delete_many({"league_id": {"$nin": sorted(leagues)}})
+        if requests:
+            await self.collection.bulk_write(requests, ordered=False)
+        return {league: await self.totals(league) for league in sorted(leagues)}
+
+    async def ensure(self):
+        """Build the ledger on first start, or after upgrading from an older row layout.
+
+        Whether that happened is recorded in the migrations collection rather than
+        read off the ledger, which a player write may have started filling already.
+        """
+        done = await self.migrations_collection.find_one(
+            {"name": MIGRATION_NAME, "version": {"$gte": LEDGER_SCHEMA_VERSION}}, {"_id": 0})
+        if done is None:
+            await self.rebuild()
+            await self.migrations_collection.update_one(
+                {"name": MIGRATION_NAME}, {"$set": {"version": LEDGER_SCHEMA_VERSION}}, upsert=True)
@@ -0,0 +1,191 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from pymongo import monitoring
+
+# Latency buckets in seconds, from a cached read to a slow aggregation
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+# Documents returned or written by a single Mongo command
+DOCUMENT_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Counter incremented directly, or read from `callback()` -> {label values: value} at scrape time"""
+
+    def __init__(self, name, help_text, labels=(), callback=None):
+        self.name, self.help_text, self.labels = name, help_text, tuple(labels)
+        self.callback = callback
+        self._values = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] += amount
+
+    def render(self):
+        values = self.callback() if self.callback else self._values
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for label_values, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {_format_value(value)}")
+        return lines
+
+
+class Gauge:
+    """Gauge set directly, or read from `callback()` -> {label values: value} at scrape time"""
+
+    def __init__(self, name, help_text, labels=(), callback=None):
+        self.name, self.help_text, self.labels = name, help_text, tuple(labels)
+        self.callback = callback
+        self._values = defaultdict(float)
+
+    def inc(self, *label_values, amount=1):
+        self._values[label_values] += amount
+
+    def dec(self, *label_values, amount=1):
+        self._values[label_values] -= amount
+
+    def render(self):
+        values = self.callback() if self.callback else self._values
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        for label_values, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help_text, self.labels = name, help_text, tuple(labels)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (last one is +Inf), sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = sorted((labels, list(counts), total) for labels, (counts, total) in self._series.items())
+        for label_values, counts, total in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _format_labels(self.labels, label_values, [("le", _format_value(bound))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels, label_values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class RequestMetricsMiddleware:
+    """Plain ASGI middleware timing every HTTP request by route template, method and status.
+
+    The route label is the matched path template (e.g. /api/players/role/{role}), so
+    path parameters do not explode the number of series. Streaming responses are
+    timed until their last body chunk is sent.
+    """
+
+    def __init__(self, app, duration, in_flight, exclude_paths=()):
+        self.app = app
+        self.duration = duration
+        self.in_flight = in_flight
+        self.exclude_paths = set(exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        self.in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.in_flight.dec()
+            route = scope.get("route")
+            self.duration.observe(time.perf_counter() - started, getattr(route, "path", "unmatched"),
+                                  scope["method"], str(status))
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """pymongo command listener recording the duration and document count of every command.
+
+    Documents are counted from the reply: the cursor batch for find/aggregate/getMore,
+    `n` for writes. Listener callbacks run on the driver's worker threads.
+    """
+
+    def __init__(self, duration, documents, failures):
+        self.duration = duration
+        self.documents = documents
+        self.failures = failures
+        self._collections = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            collection = event.command.get("collection")
+        self._collections[(event.connection_id, event.request_id)] = collection if isinstance(collection, str) else ""
+
+    def succeeded(self, event):
+        collection = self._collections.pop((event.connection_id, event.request_id), "")
+        self.duration.observe(event.duration_micros / 1e6, event.command_name, collection)
+        reply = event.reply
+        cursor = reply.get("cursor")
+        if cursor is not None:
+            count = len(cursor.get("firstBatch", cursor.get("nextBatch", ())))
+        else:
+            count = reply.get("n")
+        if count is not None:
+            self.documents.observe(count, event.command_name, collection)
+
+    def failed(self, event):
+        collection = self._collections.pop((event.connection_id, event.request_id), "")
+        self.duration.observe(event.duration_micros / 1e6, event.command_name, collection)
+        self.failures.inc(event.command_name, collection)
@@ -0,0 +1,190 @@
+import bisect
+import time
+from collections import defaultdict
+
+from ledger import ROLES
+from strategy import DEFAULT_SLOTS, player_score
+
+
+def _created_key(player):
+    created_at = player.get("created_at")
+    return created_at.isoformat() if hasattr(created_at, "isoformat") else str(created_at or "")
+
+
+class AuctionPlanner:
+    """Live recommendation state, updated incrementally from the change feed.
+
+    Every primary choice opens a slot; its backups (related_to_player_id) queue
+    behind it by priority_order. Buying any player of a slot fills it, and when
+    a primary is removed from the watchlist its best backup is promoted. Each
+    change touches only the affected slot and role counters, so answering
+    "what next?" never rescans the whole watchlist.
+    """
+
+    def __init__(self, slots=None, weights=None):
+        self.slots_per_role = {**DEFAULT_SLOTS, **(slots or {})}
+        self.weights = weights or {}
+        self.loaded = False
+        # Change-feed events received while a load reads the players, replayed once it is done
+        self.pending = None
+
+    def begin_load(self):
+        """Buffer change-feed events until load() ends, so bids and deletes made while reading are kept"""
+        self.pending = []
+
+    def abort_load(self):
+        self.pending = None
+
+    def load(self, players, budget):
+        self.players = {}
+        self.budget = budget
+        self.spent = defaultdict(float)
+        self.owned_count = defaultdict(int)
+        # role -> sorted [(created_at, id)] of primaries still to buy
+        self.primaries = defaultdict(list)
+        # role -> primary id -> sorted [(priority_order, created_at, id)] of backups still to buy
+        self.backups = defaultdict(lambda: defaultdict(list))
+        # role -> sorted [(-score, id)] of backups not tied to a primary
+        self.unrelated = defaultdict(list)
+        # primary id -> number of owned players that fill its slot
+        self.filled = defaultdict(int)
+        for player in players:
+            self._add(player)
+        pending, self.pending = self.pending or [], None
+        self.loaded = True
+        for event in pending:
+            self.apply(event)
+
+    def _index_entries(self, player):
+        """(container, sort key) pairs this player occupies while it is still to buy"""
+        role = player.get("role")
+        if player.get("is_primary_choice", True) is not False:
+            return [(self.primaries[role], (_created_key(player), player["id"]))]
+        related = player.get("related_to_player_id")
+        if related:
+            key = (player.get("priority_order", 2), _created_key(player), player["id"])
+            return [(self.backups[role][related], key)]
+        return [(self.unrelated[role], (-player_score(player, self.weights), player["id"]))]
+
+    def _add(self, player):
+        self.players[player["id"]] = player
+        role = player.get("role")
+        if (player.get("price_paid") or 0) > 0:
+            self.spent[role] += player["price_paid"]
+            self.owned_count[role] += 1
+            self.filled[self._slot_of(player)] += 1
+            return
+        for container, key in self._index_entries(player):
+            bisect.insort(container, key)
+
+    def _remove(self, player):
+        self.players.pop(player["id"], None)
+        role = player.get("role")
+        if (player.get("price_paid") or 0) > 0:
+            self.spent[role] -= player["price_paid"]
+            self.owned_count[role] -= 1
+            self.filled[self._slot_of(player)] -= 1
+            return
+        for container, key in self._index_entries(player):
+            index = bisect.bisect_left(container, key)
+            if index < len(container) and container[index] == key:
+                container.pop(index)
+
+    @staticmethod
+    def _slot_of(player):
+        if player.get("is_primary_choice", True) is not False:
+            return player["id"]
+        return player.get("related_to_player_id") or player["id"]
+
+    def apply(self, event):
+        """Consume one change-feed event"""
+        if not self.loaded:
+            if self.pending is not None:
+                self.pending.append(event)
+            return
+        kind = event.get("type")
+        if kind == "player":
+            player_id = event["id"] if event.get("op") == "deleted" else event["player"]["id"]
+            previous = self.players.get(player_id)
+            if previous is not None:
+                self._remove(previous)
+            if event.get("op") != "deleted":
+                self._add(dict(event["player"]))
+        elif kind == "budget":
+            self.budget = event["budget"]
+        elif kind == "resync":
+            self.loaded = False
+
+    def _slot_heads(self, role):
+        """Slot ids of the role in display order: primaries first, then orphaned backup queues"""
+        heads = [player_id for _, player_id in self.primaries[role]]
+        for primary_id, queue in self.backups[role].items():
+            if queue and primary_id not in self.players:
+                heads.append(primary_id)
+        return heads
+
+    def recommend_role(self, role):
+        allocated = self.budget.get(f"{role}_budget", 0)
+        spent = self.spent[role]
+        remaining = allocated - spent
+        open_slots = max(0, self.slots_per_role.get(role, 0) - self.owned_count[role])
+        targets = []
+        for slot_id in self._slot_heads(role):
+            if self.filled[slot_id] > 0:
+                continue
+            queue = [player_id for *_, player_id in self.backups[role].get(slot_id, ())]
+            if slot_id in self.players:
+                queue.insert(0, slot_id)
+            target = self._pick_affordable(queue, remaining)
+            if target is None:
+                continue
+            targets.append(self._target_entry(slot_id, target, remaining, open_slots))
+        # Backups without a primary fill whatever slots are still open
+        for _, player_id in self.unrelated[role]:
+            if len(targets) >= open_slots:
+                break
+            player = self.players[player_id]
+            if (player.get("max_desired_price") or 0) <= remaining:
+                targets.append(self._target_entry(None, player, remaining, open_slots))
+        targets = targets[:open_slots]
+        return {
+            "allocated": allocated,
+            "spent": spent,
+            "remaining": remaining,
+            "open_slots": open_slots,
+            "next": targets[0] if targets else None,
+            "targets": targets,
+        }
+
+    def _pick_affordable(self, queue, remaining):
+        """First player in slot order whose max desired price still fits, else the first one"""
+        for player_id in queue:
+            if (self.players[player_id].get("max_desired_price") or 0) <= remaining:
+                return self.players[player_id]
+        return self.players[queue[0]] if queue else None
+
+    def _target_entry(self, slot_id, player, remaining, open_slots):
+        # Keep at least one credit for every other open slot
+        bid_room = max(0.0, remaining - max(0, open_slots - 1))
+        max_desired = player.get("max_desired_price") or 0
+        return {
+            "slot": slot_id,
+            "id": player["id"],
+            "name": player.get("name"),
+            "team": player.get("team"),
+            "promoted_backup": slot_id is not None and player["id"] != slot_id,
+            "max_desired_price": max_desired,
+            "max_bid": min(max_desired, bid_room) if max_desired else bid_room,
+            "over_budget": max_desired > remaining,
+        }
+
+    def recommend(self, role=None):
+        started = time.perf_counter()
+        roles = [role] if role else ROLES
+        result = {
+            "total_budget": self.budget.get("total_budget", 0),
+            "total_spent": sum(self.spent[r] for r in ROLES),
+            "roles": {r: self.recommend_role(r) for r in roles},
+        }
+        result["elapsed_ms"] = (time.perf_counter() - started) * 1000
+        return result
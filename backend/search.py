@@ -0,0 +1,260 @@
+import bisect
+import heapq
+import time
+import unicodedata
+from collections import Counter, defaultdict
+
+from ledger import ROLES
+
+# Numeric columns that accept range filters and sorting
+NUMERIC_FIELDS = ("goals", "assists", "price_paid", "max_desired_price")
+BOOLEAN_FIELDS = ("is_penalty_taker", "is_starter", "is_primary_choice")
+SORT_FIELDS = ("relevance", "name", "team", "created_at") + NUMERIC_FIELDS
+# Share of the query's trigrams a name must contain to count as a fuzzy match
+FUZZY_THRESHOLD = 0.5
+
+
+def normalize(text):
+    """Lowercase and strip accents, so "Dumfries" matches "dumfries" and "Koné" matches "kone" """
+    decomposed = unicodedata.normalize("NFKD", str(text or "").lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def trigrams(text):
+    """pg_trgm-style trigrams: every word padded with two leading blanks and one trailing blank"""
+    grams = set()
+    for word in normalize(text).split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _created_timestamp(player):
+    created_at = player.get("created_at")
+    return created_at.timestamp() if hasattr(created_at, "timestamp") else 0.0
+
+
+class PlayerSearchIndex:
+    """In-memory search over one league's players, updated incrementally from the change feed.
+
+    Range and boolean filters run as NumPy masks over columnar arrays (one row
+    per player, deleted rows are recycled). Name and team matching uses a
+    sorted word list for prefix search and trigram postings for typo-tolerant
+    fuzzy search, so no query ever scans the documents in Python.
+    """
+
+    def __init__(self):
+        self.loaded = False
+        # Change-feed events received while a load reads the players, replayed once it is done
+        self.pending = None
+
+    def begin_load(self):
+        """Buffer change-feed events until finish_load(), so writes made while the players are read are kept"""
+        self.pending = []
+
+    def abort_load(self):
+        self.pending = None
+
+    def finish_load(self):
+        """Mark the built index loaded and apply the events buffered since begin_load()"""
+        pending, self.pending = self.pending or [], None
+        self.loaded = True
+        for event in pending:
+            self.apply(event)
+
+    def load(self, players):
+        self.build(players)
+        self.finish_load()
+
+    def build(self, players):
+        """Index `players` from scratch; CPU-bound, so the server runs it in a worker thread"""
+        import numpy as np  # deferred: the server imports this module at startup
+
+        capacity = max(1024, 2 * len(players))
+        self.docs = [None] * capacity
+        self.row_of = {}
+        self.free_rows = list(range(capacity - 1, -1, -1))
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.numeric = {field: np.zeros(capacity) for field in NUMERIC_FIELDS}
+        self.flags = {field: np.zeros(capacity, dtype=bool) for field in BOOLEAN_FIELDS}
+        self.role = np.full(capacity, -1, dtype=np.int8)
+        self.team = np.full(capacity, -1, dtype=np.int32)
+        self.team_codes = {}
+        self.created = np.zeros(capacity)
+        self.sort_name = [""] * capacity
+        self.sort_team = [""] * capacity
+        # sorted [(word, row)] of name and team words, for prefix search
+        self.words = []
+        # trigram -> rows whose name or team contains it
+        self.postings = defaultdict(set)
+        for player in players:
+            self._add(player, bulk=True)
+        self.words.sort()
+
+    def _grow(self):
+        import numpy as np
+
+        old = len(self.docs)
+        self.docs.extend([None] * old)
+        self.sort_name.extend([""] * old)
+        self.sort_team.extend([""] * old)
+        self.free_rows.extend(range(2 * old - 1, old - 1, -1))
+        self.alive = np.concatenate([self.alive, np.zeros(old, dtype=bool)])
+        self.role = np.concatenate([self.role, np.full(old, -1, dtype=np.int8)])
+        self.team = np.concatenate([self.team, np.full(old, -1, dtype=np.int32)])
+        self.created = np.concatenate([self.created, np.zeros(old)])
+        for columns, dtype in ((self.numeric, float), (self.flags, bool)):
+            for field, column in columns.items():
+                columns[field] = np.concatenate([column, np.zeros(old, dtype=dtype)])
+
+    @staticmethod
+    def _text_words(player):
+        return set(normalize(player.get("name")).split()) | set(normalize(player.get("team")).split())
+
+    def _add(self, player, bulk=False):
+        if not self.free_rows:
+            self._grow()
+        row = self.free_rows.pop()
+        self.row_of[player["id"]] = row
+        self.docs[row] = player
+        self.alive[row] = True
+        for field in NUMERIC_FIELDS:
+            self.numeric[field][row] = player.get(field, 0) or 0
+        for field in BOOLEAN_FIELDS:
+            default = field == "is_primary_choice"
+            self.flags[field][row] = bool(player.get(field, default))
+        self.role[row] = ROLES.index(player["role"]) if player.get("role") in ROLES else -1
+        self.created[row] = _created_timestamp(player)
+        self.sort_name[row] = normalize(player.get("name"))
+        self.sort_team[row] = normalize(player.get("team"))
+        self.team[row] = self.team_codes.setdefault(self.sort_team[row], len(self.team_codes))
+        for word in self._text_words(player):
+            if bulk:
+                self.words.append((word, row))  # sorted once at the end of load()
+            else:
+                bisect.insort(self.words, (word, row))
+        for gram in trigrams(player.get("name")) | trigrams(player.get("team")):
+            self.postings[gram].add(row)
+
+    def _remove(self, player_id):
+        row = self.row_of.pop(player_id, None)
+        if row is None:
+            return
+        player = self.docs[row]
+        for word in self._text_words(player):
+            index = bisect.bisect_left(self.words, (word, row))
+            if index < len(self.words) and self.words[index] == (word, row):
+                self.words.pop(index)
+        for gram in trigrams(player.get("name")) | trigrams(player.get("team")):
+            rows = self.postings.get(gram)
+            if rows is not None:
+                rows.discard(row)
+                if not rows:
+                    del self.postings[gram]
+        self.docs[row] = None
+        self.alive[row] = False
+        self.free_rows.append(row)
+
+    def apply(self, event):
+        """Consume one change-feed event"""
+        if not self.loaded:
+            if self.pending is not None:
+                self.pending.append(event)
+            return
+        kind = event.get("type")
+        if kind == "player":
+            if event.get("op") == "deleted":
+                self._remove(event["id"])
+            else:
+                player = dict(event["player"])
+                self._remove(player["id"])
+                self._add(player)
+        elif kind == "resync":
+            self.loaded = False
+
+    def _text_matches(self, query):
+        """(rows, relevance) of players whose name or team matches `query`.
+
+        A player where every query word starts a word of the name or team scores 1;
+        otherwise the score is the share of the query's trigrams found in the name or
+        team, kept above FUZZY_THRESHOLD.
+        """
+        import numpy as np
+
+        prefix_rows = None
+        for word in normalize(query).split():
+            rows = set()
+            index = bisect.bisect_left(self.words, (word, -1))
+            while index < len(self.words) and self.words[index][0].startswith(word):
+                rows.add(self.words[index][1])
+                index += 1
+            # Every query word must start some word of the name or team
+            prefix_rows = rows if prefix_rows is None else prefix_rows & rows
+        scores = dict.fromkeys(prefix_rows or (), 1.0)
+        query_grams = trigrams(query)
+        if query_grams:
+            shared = Counter()
+            for gram in query_grams:
+                shared.update(self.postings.get(gram, ()))
+            for row, count in shared.items():
+                similarity = count / len(query_grams)
+                if similarity >= FUZZY_THRESHOLD and similarity > scores.get(row, 0.0):
+                    scores[row] = similarity
+        rows = np.fromiter(scores.keys(), dtype=np.int64, count=len(scores))
+        relevance = np.fromiter(scores.values(), dtype=np.float64, count=len(scores))
+        return rows, relevance
+
+    def search(self, q=None, team=None, role=None, ranges=None, flags=None, sort="relevance", order=None,
+               limit=50, offset=0):
+        """Filter, sort and page the league's players.
+
+        `ranges` maps a numeric field to (min, max) with None for an open end; `flags` maps
+        a boolean field to the required value.
+        """
+        import numpy as np
+
+        started = time.perf_counter()
+        if q:
+            rows, relevance = self._text_matches(q)
+        else:
+            rows = np.flatnonzero(self.alive)
+            relevance = np.zeros(len(rows))
+
+        mask = np.ones(len(rows), dtype=bool)
+        if role is not None:
+            mask &= self.role[rows] == (ROLES.index(role) if role in ROLES else -2)
+        if team:
+            mask &= self.team[rows] == self.team_codes.get(normalize(team), -2)
+        for field, (low, high) in (ranges or {}).items():
+            column = self.numeric[field][rows]
+            if low is not None:
+                mask &= column >= low
+            if high is not None:
+                mask &= column <= high
+        for field, value in (flags or {}).items():
+            mask &= self.flags[field][rows] == value
+        rows, relevance = rows[mask], relevance[mask]
+
+        if sort == "relevance" and not q:
+            sort = "name"
+        descending = order == "desc" if order else sort in ("relevance",) + NUMERIC_FIELDS
+        end = offset + limit
+        if sort in ("name", "team"):
+            # Only the requested page is ordered: a bounded heap over the precomputed sort keys
+            keys = self.sort_name if sort == "name" else self.sort_team
+            select = heapq.nlargest if descending else heapq.nsmallest
+            page = select(end, rows.tolist(), key=keys.__getitem__)[offset:]
+        else:
+            values = relevance if sort == "relevance" else self.created[rows] if sort == "created_at" \
+                else self.numeric[sort][rows]
+            # Stable, so ties keep row order
+            order_index = np.argsort(-values if descending else values, kind="stable")
+            page = rows[order_index[offset:end]].tolist()
+
+        return {
+            "total": int(len(rows)),
+            "limit": limit,
+            "offset": offset,
+            "items": [self.docs[row] for row in page],
+            "elapsed_ms": (time.perf_counter() - started) * 1000,
+        }
@@ -1,14 +1,89 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Request, Response, UploadFile, File
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pymongo import MongoClient
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pymongo import ASCENDING, DESCENDING, IndexModel, ReturnDocument
+from pymongo.errors import PyMongoError, BulkWriteError
+from pydantic import BaseModel, Field, ValidationError
+from typing import Dict, List, Optional
+from collections import defaultdict
+from cache import ReadCache, VersionTracker
+from events import ChangeBroker, watch_mongo_changes
+from audit import AuditLog
+from budgets import BUDGET_HISTORY_INDEXES, BUDGET_HEAD_INDEXES, BudgetHistory
+from fastjson import COMPRESS_MIN_SIZE, GZIP_LEVEL, EncodedJSON, FastJSONResponse, SelectiveGZipMiddleware, dumps
+from metrics import (DOCUMENT_BUCKETS, Counter, Gauge, Histogram, MetricsRegistry, MongoCommandMetrics,
+                     RequestMetricsMiddleware)
+from ledger import ROLES, DEFAULT_LEAGUE, LEDGER_INDEXES, OBSOLETE_LEDGER_INDEXES, LEDGER_PROJECTION, BudgetLedger
+from search import SORT_FIELDS
+from contextlib import asynccontextmanager
+from email.utils import format_datetime
 import os
 import uuid
-from datetime import datetime
+import json
+import base64
+import asyncio
+import logging
+import csv
+import io
+import re
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app):
+    """Open storage and prepare it in the background, so a slow or unreachable database never blocks startup"""
+    open_storage()
+    audit_log.open()
+    app.state.storage_task = asyncio.create_task(prepare_storage())
+    # A reachable database is prepared within milliseconds: serve the first request with indexes and ledger in place
+    await asyncio.wait({app.state.storage_task}, timeout=STORAGE_STARTUP_WAIT_SECONDS)
+    app.state.change_feed_task = start_change_feed()
+    try:
+        yield
+    finally:
+        for task in (app.state.storage_task, app.state.change_feed_task):
+            if task is not None:
+                task.cancel()
+        audit_log.close()
+        close_storage()
+
+# Routes that work without prepared storage: the probes, and the feed, which only relays published events
+STORAGE_EXEMPT_PATHS = ("/api/health", "/api/metrics", "/api/events")
+
+def require_storage_ready(request: Request):
+    """503 until the startup migrations have run: a write before them would be undone or double counted"""
+    if not storage_state["ready"] and request.url.path not in STORAGE_EXEMPT_PATHS:
+        raise HTTPException(status_code=503, detail="Storage is starting up, retry shortly", headers={"Retry-After": "1"})
 
 # Initialize FastAPI app
-app = FastAPI(title="Fantasy Football Auction Manager")
+app = FastAPI(title="Fantasy Football Auction Manager", default_response_class=FastJSONResponse, lifespan=lifespan,
+              dependencies=[Depends(require_storage_ready)])
+
+# Compress large responses; the SSE feed is excluded so events are not held in the compressor
+app.add_middleware(SelectiveGZipMiddleware, minimum_size=COMPRESS_MIN_SIZE, compresslevel=GZIP_LEVEL,
+                   exclude_paths=["/api/events"])
+
+# Prometheus metrics, exposed on /api/metrics
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') != '0'
+metrics_registry = MetricsRegistry()
+http_request_duration = metrics_registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template.", ["route", "method", "status"]))
+http_requests_in_flight = metrics_registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served."))
+mongo_command_duration = metrics_registry.register(Histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency.", ["command", "collection"]))
+mongo_command_documents = metrics_registry.register(Histogram(
+    "mongo_command_documents", "Documents returned or written per MongoDB command.", ["command", "collection"],
+    buckets=DOCUMENT_BUCKETS))
+mongo_command_failures = metrics_registry.register(Counter(
+    "mongo_command_failures_total", "MongoDB commands that failed.", ["command", "collection"]))
+mongo_command_metrics = MongoCommandMetrics(mongo_command_duration, mongo_command_documents, mongo_command_failures)
+
+if METRICS_ENABLED:
+    # The SSE feed is a never-ending request and the scrape itself is not worth timing
+    app.add_middleware(RequestMetricsMiddleware, duration=http_request_duration, in_flight=http_requests_in_flight,
+                       exclude_paths=["/api/metrics", "/api/events"])
 
 # CORS middleware
 app.add_middleware(
@@ -17,14 +92,319 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Last-Modified"],
 )
 
-# MongoDB connection
+# MongoDB connection (async driver, pooled so concurrent requests don't block the event loop)
 MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-client = MongoClient(MONGO_URL)
-db = client.fantasy_football
-players_collection = db.players
-budgets_collection = db.budgets
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', '100'))
+MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', '0'))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000'))
+MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', '5000'))
+MONGO_SOCKET_TIMEOUT_MS = int(os.environ.get('MONGO_SOCKET_TIMEOUT_MS', '10000'))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', '5000'))
+
+# Storage backend: "mongo" (default), or "sqlite" for an embedded single-file database at
+# SQLITE_PATH that needs no server (offline use, demos, tests)
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'mongo')
+SQLITE_PATH = os.environ.get('SQLITE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fantasy_football.db'))
+SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+
+if STORAGE_BACKEND not in ("mongo", "sqlite"):
+    raise RuntimeError(f"Unknown STORAGE_BACKEND {STORAGE_BACKEND!r} (expected 'mongo' or 'sqlite')")
+
+# Startup waits at most this long for the database; after that it keeps retrying in the background
+STORAGE_STARTUP_WAIT_SECONDS = float(os.environ.get('STORAGE_STARTUP_WAIT_SECONDS', '2'))
+STORAGE_PING_TIMEOUT_SECONDS = float(os.environ.get('STORAGE_PING_TIMEOUT_SECONDS', '2'))
+STORAGE_RETRY_MAX_SECONDS = float(os.environ.get('STORAGE_RETRY_MAX_SECONDS', '30'))
+
+# Created by open_storage() when the app starts (the CLI calls it directly); nothing connects at import
+client = None
+db = None
+players_collection = None
+budgets_collection = None
+ledger_collection = None
+budget_heads_collection = None
+migrations_collection = None
+# Whether the idempotent startup migrations have run, and the last connection error
+storage_state = {"ready": False, "error": None}
+
+# Per-role spent/max desired totals maintained with $inc on every player write
+budget_ledger = BudgetLedger(None, None)
+
+# Versioned budget history; 0 keeps every version, otherwise older versions are compacted on save
+BUDGET_HISTORY_KEEP_VERSIONS = int(os.environ.get('BUDGET_HISTORY_KEEP_VERSIONS', '0'))
+BUDGET_HISTORY_KEEP_DAYS = os.environ.get('BUDGET_HISTORY_KEEP_DAYS')
+budget_history = BudgetHistory(
+    None, None,
+    keep_versions=BUDGET_HISTORY_KEEP_VERSIONS or None,
+    keep_days=float(BUDGET_HISTORY_KEEP_DAYS) if BUDGET_HISTORY_KEEP_DAYS else None,
+)
+
+# Append-only log of every player and budget mutation, for disputes and point-in-time replay ('' disables it).
+# Writes are acknowledged once their events are fsynced; concurrent writes share one fsync.
+AUDIT_LOG_PATH = os.environ.get('AUDIT_LOG_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'audit.log'))
+AUDIT_LOG_FSYNC = os.environ.get('AUDIT_LOG_FSYNC', '1') != '0'
+audit_log = AuditLog(AUDIT_LOG_PATH, fsync=AUDIT_LOG_FSYNC)
+
+async def log_budget_compaction(league_id, through_version, before, deleted):
+    # Logged with its bounds rather than the versions' contents, so replay removes exactly the same versions
+    await audit_log.append({"type": "budget", "op": "compacted", "league_id": league_id,
+                            "through_version": through_version, "before": before, "deleted": deleted})
+
+budget_history.on_compact = log_budget_compaction
+
+def bind_collections(database):
+    """Point the collection handles, the ledger and the budget history at `database`"""
+    global db, players_collection, budgets_collection, ledger_collection, budget_heads_collection, migrations_collection
+    db = database
+    players_collection = database.players
+    budgets_collection = database.budgets
+    ledger_collection = database.budget_ledger
+    budget_heads_collection = database.budget_heads
+    migrations_collection = database.migrations
+    budget_ledger.collection = ledger_collection
+    budget_ledger.players_collection = players_collection
+    budget_ledger.migrations_collection = migrations_collection
+    budget_history.collection = budgets_collection
+    budget_history.heads_collection = budget_heads_collection
+
+def open_storage():
+    """Create the storage client unless one is bound already. No I/O: the driver connects on first use"""
+    global client
+    if db is not None:
+        return db
+    if STORAGE_BACKEND == "sqlite":
+        from sqlite_store import SQLiteDatabase
+
+        client = SQLiteDatabase(SQLITE_PATH, synchronous=SQLITE_SYNCHRONOUS)
+        bind_collections(client)
+    else:
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        client = AsyncIOMotorClient(
+            MONGO_URL,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+            socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+            waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            event_listeners=[mongo_command_metrics] if METRICS_ENABLED else [],
+        )
+        bind_collections(client.fantasy_football)
+    return db
+
+def close_storage():
+    global client, db
+    if client is not None:
+        client.close()
+        client = None
+        db = None
+        storage_state["ready"] = False
+
+async def ping_storage():
+    await asyncio.wait_for(db.command("ping"), STORAGE_PING_TIMEOUT_SECONDS)
+
+# Read cache for the endpoints the frontend refetches after every write
+READ_CACHE_TTL_SECONDS = float(os.environ.get('READ_CACHE_TTL_SECONDS', '30'))
+read_cache = ReadCache(ttl_seconds=READ_CACHE_TTL_SECONDS)
+
+# Write counters behind the ETag/Last-Modified validators of the read endpoints. Validators also
+# expire with the cache TTL, which bounds how long writes from outside this process go unnoticed.
+collection_versions = VersionTracker(max_age_seconds=max(READ_CACHE_TTL_SECONDS, 1.0))
+
+metrics_registry.register(Counter(
+    "read_cache_requests_total", "Read cache lookups by outcome.", ["result"],
+    callback=lambda: {("hit",): read_cache.hits, ("miss",): read_cache.misses}))
+metrics_registry.register(Counter(
+    "read_cache_invalidations_total", "Read cache keys invalidated by writes.",
+    callback=lambda: {(): read_cache.invalidations}))
+metrics_registry.register(Gauge(
+    "read_cache_hit_ratio", "Share of read cache lookups served from memory.",
+    callback=lambda: {(): read_cache.stats()["hit_rate"]}))
+metrics_registry.register(Gauge(
+    "read_cache_entries", "Entries currently held by the read cache.",
+    callback=lambda: {(): read_cache.stats()["entries"]}))
+
+def invalidate_player_reads(league_id, *roles):
+    """Drop cached reads of the league affected by a player write in the given roles"""
+    collection_versions.bump(f"players:{league_id}")
+    keys = [("players", league_id), ("budget_summary", league_id), ("dashboard", league_id)]
+    for role in set(roles):
+        keys += [("players_role", league_id, role), ("players_primary", league_id, role)]
+    read_cache.invalidate(*keys)
+
+def invalidate_budget_reads(league_id):
+    collection_versions.bump(f"budgets:{league_id}")
+    read_cache.invalidate(("budget", league_id), ("budget_summary", league_id), ("dashboard", league_id))
+
+# Change feed pushed to browsers over SSE. "inprocess" publishes from the write routes;
+# "mongo" tails change streams instead (needs a replica set, works across processes).
+CHANGE_FEED_SOURCE = os.environ.get('CHANGE_FEED_SOURCE', 'inprocess')
+change_broker = ChangeBroker()
+metrics_registry.register(Gauge(
+    "sse_subscribers", "Clients connected to the /api/events feed.",
+    callback=lambda: {(): change_broker.subscriber_count}))
+
+def new_auction_planner():
+    # The planner and search index pull in NumPy; importing them on first use keeps startup light
+    from planner import AuctionPlanner
+
+    return AuctionPlanner()
+
+def new_search_index():
+    from search import PlayerSearchIndex
+
+    return PlayerSearchIndex()
+
+# Live recommendations per league, kept current by the change feed instead of re-planning on every read
+auction_planners = defaultdict(new_auction_planner)
+auction_planner_lock = asyncio.Lock()
+
+# In-memory player search per league, maintained the same way
+search_indexes = defaultdict(new_search_index)
+search_index_lock = asyncio.Lock()
+
+def league_event_router(registry):
+    """Listener forwarding each event to the league's entry of `registry` (league-less events go to all)"""
+    def route(event):
+        league_id = event.get("league_id")
+        if league_id is None:
+            targets = list(registry.values())
+        else:
+            targets = [registry[league_id]] if league_id in registry else []
+        for target in targets:
+            target.apply(event)
+    return route
+
+change_broker.add_listener(league_event_router(auction_planners))
+change_broker.add_listener(league_event_router(search_indexes))
+
+def invalidate_changed_reads(event):
+    """Listener dropping cached reads for writes seen on the Mongo change feed, including other processes' writes"""
+    league_id = event.get("league_id")
+    if league_id is None:
+        # A player delete: the change stream does not say which league it was in
+        collection_versions.bump_prefix("players:")
+        read_cache.clear()
+    elif event["type"] == "player":
+        # Only the new document is known, so a role change may have left the old role's lists stale
+        invalidate_player_reads(league_id, *ROLES)
+    elif event["type"] == "budget":
+        invalidate_budget_reads(league_id)
+
+if CHANGE_FEED_SOURCE == "mongo":
+    change_broker.add_listener(invalidate_changed_reads)
+
+def publish_change(event):
+    if CHANGE_FEED_SOURCE == "inprocess":
+        change_broker.publish(event)
+
+def etag_matches(if_none_match, etag):
+    """Weak comparison of an If-None-Match header against our ETag"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any(tag.removeprefix("W/") == etag.removeprefix("W/") for tag in candidates)
+
+def conditional_get(request: Request, response: Response, league_id, *collections):
+    """Set ETag/Last-Modified on the response; return a 304 when the client copy is current"""
+    collections = [f"{name}:{league_id}" for name in collections]
+    headers = {
+        "ETag": collection_versions.etag(*collections),
+        "Last-Modified": format_datetime(collection_versions.last_modified(*collections), usegmt=True),
+    }
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+# Indexes backing the hot queries. Names are fixed so the bootstrap is idempotent.
+# Every route is scoped by league, so league_id leads each compound index.
+PLAYER_INDEXES = [
+    IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    # /api/players/role/{role} and /api/players/primary/{role}
+    IndexModel([("league_id", ASCENDING), ("role", ASCENDING), ("is_primary_choice", ASCENDING),
+                ("created_at", ASCENDING)], name="league_role_primary_created"),
+    # Keyset pagination of /api/players
+    IndexModel([("league_id", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)], name="league_created_id"),
+    # Backups looked up by the primary choice they are related to
+    IndexModel([("league_id", ASCENDING), ("related_to_player_id", ASCENDING), ("priority_order", ASCENDING)],
+               name="league_related_priority"),
+]
+BUDGET_INDEXES = [
+    IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    # Time-travel lookup: latest version created at or before ?at=
+    IndexModel([("league_id", ASCENDING), ("created_at", DESCENDING)], name="league_created_at_desc"),
+] + BUDGET_HISTORY_INDEXES
+# Single-league indexes superseded by the league-prefixed ones above
+OBSOLETE_INDEXES = {
+    "players": ["role_primary_created", "created_id", "related_priority"],
+    "budgets": ["created_at_desc"],
+    "budget_ledger": OBSOLETE_LEDGER_INDEXES,
+}
+
+async def backfill_league_ids():
+    """Documents written before leagues existed belong to the default league"""
+    for collection in (players_collection, budgets_collection):
+        result = await collection.update_many({"league_id": {"$exists": False}}, {"$set": {"league_id": DEFAULT_LEAGUE}})
+        if result.modified_count:
+            logger.info("Assigned %d %s documents to league %r", result.modified_count, collection.name, DEFAULT_LEAGUE)
+
+async def backfill_player_versions():
+    """Players written before optimistic concurrency start at version 1"""
+    result = await players_collection.update_many({"version": {"$exists": False}}, {"$set": {"version": 1}})
+    if result.modified_count:
+        logger.info("Assigned version 1 to %d players", result.modified_count)
+
+async def ensure_indexes():
+    """Create the indexes used by the API routes (no-op when they already exist)"""
+    for collection, indexes in ((players_collection, PLAYER_INDEXES), (budgets_collection, BUDGET_INDEXES),
+                                (ledger_collection, LEDGER_INDEXES), (budget_heads_collection, BUDGET_HEAD_INDEXES)):
+        try:
+            existing = await collection.index_information()
+            for name in OBSOLETE_INDEXES.get(collection.name, []):
+                if name in existing:
+                    await collection.drop_index(name)
+                    logger.info("Dropped obsolete index %s on %s", name, collection.name)
+            names = await collection.create_indexes(indexes)
+            logger.info("Indexes ensured on %s: %s", collection.name, ", ".join(names))
+        except PyMongoError as e:
+            # Conflicting index options or an unreachable server must not prevent startup
+            logger.warning("Could not ensure indexes on %s: %s", collection.name, e)
+
+async def prepare_storage():
+    """Wait until the database answers, then run the idempotent backfills, index builds and ledger check"""
+    delay = 0.5
+    while True:
+        try:
+            await ping_storage()
+            break
+        except (PyMongoError, OSError, asyncio.TimeoutError) as e:
+            storage_state["error"] = str(e) or type(e).__name__
+            logger.warning("Storage not reachable (%s), retrying in %.1fs", storage_state["error"], delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, STORAGE_RETRY_MAX_SECONDS)
+    storage_state["error"] = None
+    try:
+        await backfill_league_ids()
+        await backfill_player_versions()
+        # Versions must be numbered before the unique (league_id, version) index is built
+        await budget_history.ensure()
+    except PyMongoError as e:
+        logger.warning("Could not backfill player and budget fields: %s", e)
+    await ensure_indexes()
+    try:
+        await budget_ledger.ensure()
+    except PyMongoError as e:
+        logger.warning("Could not initialize the budget ledger: %s", e)
+    storage_state["ready"] = True
+
+def start_change_feed():
+    if CHANGE_FEED_SOURCE == "mongo":
+        return asyncio.create_task(watch_mongo_changes(change_broker, players_collection, budgets_collection))
+    return None
 
 # Pydantic models
 class Player(BaseModel):
@@ -42,15 +422,23 @@ class Player(BaseModel):
     priority_order: int = 1  # 1 = primary, 2+ = backup choices
     related_to_player_id: Optional[str] = None  # ID of the primary choice this backup is related to
     notes: str = ""  # Note personali per il giocatore
+    league_id: str = DEFAULT_LEAGUE  # Always set from the request's league scope
+    version: int = 1  # Bumped on every write; updates that send it are rejected if it is stale
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+class BidRequest(BaseModel):
+    price_paid: float = Field(ge=0)
+    version: int  # Player version the bid was made against
+
 class BudgetConfig(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    league_id: str = DEFAULT_LEAGUE
     total_budget: float = 500.0
     portiere_budget: float = 10.0
     difensore_budget: float = 90.0
     centrocampista_budget: float = 200.0
     attaccante_budget: float = 200.0
+    version: int = 0  # Assigned by the budget history when saved
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 class UpdateBudgetRequest(BaseModel):
@@ -60,175 +448,898 @@ class UpdateBudgetRequest(BaseModel):
     centrocampista_budget: float
     attaccante_budget: float
 
+class StrategyWeights(BaseModel):
+    base: float = 1.0  # every filled slot is worth something
+    goal: float = 3.0
+    assist: float = 1.0
+    penalty: float = 2.0
+    starter: float = 4.0
+
+class StrategyRequest(BaseModel):
+    weights: StrategyWeights = Field(default_factory=StrategyWeights)
+    slots: Dict[str, int] = Field(default_factory=dict)  # overrides of the default roster size per role
+    primary_only: bool = False
+
+LEAGUE_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+def get_league_id(
+    league: Optional[str] = Query(None, description="League to operate on"),
+    x_league_id: Optional[str] = Header(None),
+) -> str:
+    """League scope of the request: ?league=, else the X-League-Id header, else the default league"""
+    league_id = league or x_league_id or DEFAULT_LEAGUE
+    if not LEAGUE_ID_PATTERN.match(league_id):
+        raise HTTPException(status_code=400, detail="Invalid league id")
+    return league_id
+
 # API Routes
 
 @app.get("/api/health")
-async def health_check():
-    return {"status": "healthy", "message": "Fantasy Football Auction Manager API"}
+async def health_check(response: Response):
+    """503 until storage is prepared, or while the database does not answer a ping"""
+    storage = {"backend": STORAGE_BACKEND, "ready": storage_state["ready"]}
+    try:
+        await ping_storage()
+    except (PyMongoError, OSError, asyncio.TimeoutError) as e:
+        storage["error"] = str(e) or type(e).__name__
+    if "error" in storage:
+        status = "unavailable"
+    else:
+        status = "healthy" if storage["ready"] else "starting"
+    if status != "healthy":
+        response.status_code = 503
+    return {"status": status, "message": "Fantasy Football Auction Manager API", "storage": storage}
+
+PLAYERS_PAGE_MAX = 1000
+NDJSON_BATCH_SIZE = 500
+
+def encode_players_cursor(player):
+    """Opaque keyset cursor pointing just after `player` in (created_at, id) order"""
+    created_at = player["created_at"]
+    if isinstance(created_at, datetime):
+        created_at = created_at.isoformat()
+    raw = json.dumps([created_at, player["id"]]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def decode_players_cursor(cursor):
+    """Turn a cursor back into a Mongo filter for the documents that follow it"""
+    try:
+        created_at, player_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        created_at = datetime.fromisoformat(created_at)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {"$or": [
+        {"created_at": {"$gt": created_at}},
+        {"created_at": created_at, "id": {"$gt": player_id}},
+    ]}
+
+def players_projection(fields):
+    """Build a projection from a comma separated field list (always keeping the cursor keys)"""
+    if not fields:
+        return {"_id": 0}
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in Player.model_fields]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    projection = {"_id": 0, "id": 1, "created_at": 1}
+    projection.update({f: 1 for f in requested})
+    return projection
+
+async def stream_ndjson(cursor):
+    """Yield documents as newline delimited JSON while Mongo returns them"""
+    async for doc in cursor:
+        yield dumps(doc) + b"\n"
+
+async def load_encoded(cursor):
+    """Cache loader: the query result rendered once as JSON bytes"""
+    return EncodedJSON(await cursor.to_list(length=None))
 
 @app.get("/api/players", response_model=List[Player])
-async def get_players():
-    """Get all players"""
+async def get_players(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=PLAYERS_PAGE_MAX),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    league_id: str = Depends(get_league_id),
+):
+    """Get all players, optionally paginated by (created_at, id) cursor, projected or streamed as NDJSON.
+
+    Documents come straight from our own collection, so responses are rendered directly
+    instead of being revalidated against the Player model.
+    """
+    query = {"league_id": league_id}
+    if cursor:
+        query.update(decode_players_cursor(cursor))
+    projection = players_projection(fields)
+    not_modified = conditional_get(request, response, league_id, "players")
+    if not_modified:
+        return not_modified
     try:
-        players = list(players_collection.find({}, {"_id": 0}))
-        return players
+        if limit is None and cursor is None and fields is None and format == "json":
+            encoded = await read_cache.get_or_load(
+                ("players", league_id),
+                lambda: load_encoded(players_collection.find({"league_id": league_id}, {"_id": 0})))
+            return encoded.response(request, response.headers)
+        
+        mongo_cursor = players_collection.find(query, projection).sort([("created_at", 1), ("id", 1)])
+        if limit is not None:
+            mongo_cursor = mongo_cursor.limit(limit)
+        
+        if format == "ndjson":
+            return StreamingResponse(stream_ndjson(mongo_cursor.batch_size(NDJSON_BATCH_SIZE)),
+                                     media_type="application/x-ndjson", headers=dict(response.headers))
+        
+        players = await mongo_cursor.to_list(length=limit)
+        headers = dict(response.headers)
+        if limit is not None and len(players) == limit:
+            headers["X-Next-Cursor"] = encode_players_cursor(players[-1])
+        return FastJSONResponse(content=players, headers=headers)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def organize_players_by_role(players):
+    """Order players as each primary choice (by creation date) followed by its related backups
+    (by priority), then the unrelated backups. Single pass grouping, O(n log n) overall."""
+    primary_choices = []
+    backups_by_primary = defaultdict(list)
+    unrelated_backups = []
+    for player in players:
+        if player.get('is_primary_choice', True):
+            primary_choices.append(player)
+        elif player.get('related_to_player_id'):
+            backups_by_primary[player['related_to_player_id']].append(player)
+        else:
+            unrelated_backups.append(player)
+    
+    # Sort primary choices by creation date
+    primary_choices.sort(key=lambda x: x.get('created_at', ''))
+    priority = lambda x: x.get('priority_order', 2)
+    
+    organized_players = []
+    for primary in primary_choices:
+        organized_players.append(primary)
+        organized_players.extend(sorted(backups_by_primary.get(primary['id'], ()), key=priority))
+    
+    # Add unrelated backup choices at the end
+    unrelated_backups.sort(key=priority)
+    organized_players.extend(unrelated_backups)
+    return organized_players
+
 @app.get("/api/players/role/{role}")
-async def get_players_by_role(role: str):
+async def get_players_by_role(role: str, request: Request, response: Response,
+                              league_id: str = Depends(get_league_id)):
     """Get players by role organized by primary choices and their related backups"""
+    not_modified = conditional_get(request, response, league_id, "players")
+    if not_modified:
+        return not_modified
     try:
-        players = list(players_collection.find({"role": role}, {"_id": 0}))
-        
-        # Separate primary choices and backups
-        primary_choices = [p for p in players if p.get('is_primary_choice', True)]
-        backup_choices = [p for p in players if not p.get('is_primary_choice', True)]
-        
-        # Organize players: primary choice followed by its related backups
-        organized_players = []
-        
-        # Sort primary choices by creation date or name
-        primary_choices.sort(key=lambda x: x.get('created_at', ''))
-        
-        for primary in primary_choices:
-            organized_players.append(primary)
-            
-            # Find backups related to this primary choice
-            related_backups = [b for b in backup_choices if b.get('related_to_player_id') == primary['id']]
-            related_backups.sort(key=lambda x: x.get('priority_order', 2))
-            
-            organized_players.extend(related_backups)
-        
-        # Add unrelated backup choices at the end
-        unrelated_backups = [b for b in backup_choices if not b.get('related_to_player_id')]
-        unrelated_backups.sort(key=lambda x: x.get('priority_order', 2))
-        organized_players.extend(unrelated_backups)
-        
-        return organized_players
+        async def load():
+            players = await players_collection.find(
+                {"league_id": league_id, "role": role}, {"_id": 0}).to_list(length=None)
+            return EncodedJSON(organize_players_by_role(players))
+        encoded = await read_cache.get_or_load(("players_role", league_id, role), load)
+        return encoded.response(request, response.headers)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def ensure_search_index(league_id):
+    """The league's search index, loaded from Mongo on first use or after a resync event"""
+    index = search_indexes[league_id]
+    if index.loaded:
+        return index
+    async with search_index_lock:
+        if not index.loaded:
+            index.begin_load()
+            try:
+                players = await players_collection.find({"league_id": league_id}, {"_id": 0}).to_list(length=None)
+                # Building takes seconds for large leagues: keep it off the event loop
+                await asyncio.to_thread(index.build, players)
+            except BaseException:
+                index.abort_load()
+                raise
+            index.finish_load()
+    return index
+
+@app.get("/api/players/search")
+async def search_players(
+    q: Optional[str] = Query(None, max_length=100, description="Prefix or fuzzy match on name and team"),
+    team: Optional[str] = None,
+    role: Optional[str] = None,
+    goals_min: Optional[int] = None,
+    goals_max: Optional[int] = None,
+    assists_min: Optional[int] = None,
+    assists_max: Optional[int] = None,
+    price_min: Optional[float] = Query(None, description="Minimum max desired price"),
+    price_max: Optional[float] = Query(None, description="Maximum max desired price"),
+    paid_min: Optional[float] = None,
+    paid_max: Optional[float] = None,
+    is_penalty_taker: Optional[bool] = None,
+    is_starter: Optional[bool] = None,
+    is_primary_choice: Optional[bool] = None,
+    sort: str = Query("relevance", pattern=f"^({'|'.join(SORT_FIELDS)})$"),
+    order: Optional[str] = Query(None, pattern="^(asc|desc)$"),
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    league_id: str = Depends(get_league_id),
+):
+    """Search the league's players by name/team with range and boolean filters, sorted and paginated"""
+    ranges = {
+        field: bounds for field, bounds in (
+            ("goals", (goals_min, goals_max)),
+            ("assists", (assists_min, assists_max)),
+            ("max_desired_price", (price_min, price_max)),
+            ("price_paid", (paid_min, paid_max)),
+        ) if bounds != (None, None)
+    }
+    flags = {
+        field: value for field, value in (
+            ("is_penalty_taker", is_penalty_taker),
+            ("is_starter", is_starter),
+            ("is_primary_choice", is_primary_choice),
+        ) if value is not None
+    }
+    try:
+        index = await ensure_search_index(league_id)
+        return index.search(q=q, team=team, role=role, ranges=ranges, flags=flags, sort=sort, order=order,
+                            limit=limit, offset=offset)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/players", response_model=Player)
-async def create_player(player: Player):
+async def create_player(player: Player, league_id: str = Depends(get_league_id)):
     """Create a new player"""
     try:
+        player.league_id = league_id
         player_dict = player.dict()
-        players_collection.insert_one(player_dict)
+        await players_collection.insert_one(player_dict)
+        await budget_ledger.apply(after=[player_dict])
+        invalidate_player_reads(league_id, player.role)
+        event = {"type": "player", "op": "created", "league_id": league_id, "player": player.dict()}
+        publish_change(event)
+        await audit_log.append(event)
         return player
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+PLAYER_WRITE_RETRIES = 5
+
+async def player_write_conflict(player_id, league_id):
+    """404 if the player is gone, else 409 carrying the version the client should retry against"""
+    current = await players_collection.find_one({"id": player_id, "league_id": league_id}, {"_id": 0, "version": 1})
+    if current is None:
+        return HTTPException(status_code=404, detail="Player not found")
+    return HTTPException(status_code=409, detail={
+        "message": "Player was modified by another request", "version": current.get("version")})
+
 @app.put("/api/players/{player_id}", response_model=Player)
-async def update_player(player_id: str, player: Player):
-    """Update a player"""
+async def update_player(player_id: str, player: Player, league_id: str = Depends(get_league_id)):
+    """Update a player; a `version` in the body turns the replace into a compare-and-swap"""
     try:
+        player.league_id = league_id
         player_dict = player.dict()
         player_dict["id"] = player_id
-        result = players_collection.replace_one({"id": player_id}, player_dict)
-        if result.matched_count == 0:
-            raise HTTPException(status_code=404, detail="Player not found")
+        expected = player.version if "version" in player.model_fields_set else None
+        # Without a client version the write still goes through the version check, retrying
+        # against the latest version so concurrent writers are serialized rather than interleaved
+        for _ in range(1 if expected is not None else PLAYER_WRITE_RETRIES):
+            version = expected
+            if version is None:
+                current = await players_collection.find_one(
+                    {"id": player_id, "league_id": league_id}, {"_id": 0, "version": 1})
+                if current is None:
+                    raise HTTPException(status_code=404, detail="Player not found")
+                version = current.get("version", 1)
+            player_dict["version"] = version + 1
+            previous = await players_collection.find_one_and_replace(
+                {"id": player_id, "league_id": league_id, "version": version}, player_dict,
+                projection=LEDGER_PROJECTION)
+            if previous is not None:
+                break
+        else:
+            raise await player_write_conflict(player_id, league_id)
+        player.version = player_dict["version"]
+        await budget_ledger.apply(before=[previous], after=[player_dict])
+        # A role change affects the cached lists of both roles
+        invalidate_player_reads(league_id, previous.get("role"), player.role)
+        event = {"type": "player", "op": "updated", "league_id": league_id, "player": player_dict}
+        publish_change(event)
+        await audit_log.append(event)
         return player
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.patch("/api/players/{player_id}/bid", response_model=Player)
+async def record_bid(player_id: str, bid: BidRequest, league_id: str = Depends(get_league_id)):
+    """Record the price paid for a player with a field-level $set, rejected with 409 if the version is stale"""
+    try:
+        previous = await players_collection.find_one_and_update(
+            {"id": player_id, "league_id": league_id, "version": bid.version},
+            {"$set": {"price_paid": bid.price_paid}, "$inc": {"version": 1}},
+            projection={"_id": 0}, return_document=ReturnDocument.BEFORE)
+        if previous is None:
+            raise await player_write_conflict(player_id, league_id)
+        player_dict = {**previous, "price_paid": bid.price_paid, "version": bid.version + 1}
+        await budget_ledger.apply(before=[previous], after=[player_dict])
+        invalidate_player_reads(league_id, previous.get("role"))
+        event = {"type": "player", "op": "updated", "league_id": league_id, "player": player_dict}
+        publish_change(event)
+        await audit_log.append(event)
+        return player_dict
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/api/players/{player_id}")
-async def delete_player(player_id: str):
+async def delete_player(player_id: str, league_id: str = Depends(get_league_id)):
     """Delete a player"""
     try:
-        result = players_collection.delete_one({"id": player_id})
-        if result.deleted_count == 0:
+        deleted = await players_collection.find_one_and_delete(
+            {"id": player_id, "league_id": league_id}, projection=LEDGER_PROJECTION)
+        if deleted is None:
             raise HTTPException(status_code=404, detail="Player not found")
+        await budget_ledger.apply(before=[deleted])
+        invalidate_player_reads(league_id, deleted.get("role"))
+        event = {"type": "player", "op": "deleted", "league_id": league_id, "id": player_id,
+                 "role": deleted.get("role")}
+        publish_change(event)
+        await audit_log.append(event)
         return {"message": "Player deleted successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def load_current_budget(league_id):
+    """Latest budget configuration of the league, creating the default one on first use"""
+    budget = await get_latest_budget(league_id)
+    if not budget:
+        # Create default budget
+        budget = await budget_history.record(BudgetConfig(league_id=league_id).dict())
+        await audit_log.append({"type": "budget", "op": "created", "league_id": league_id, "budget": budget})
+    return budget
+
+BULK_BATCH_SIZE = 1000
+BULK_MAX_REPORTED_ERRORS = 500
+
+def iter_bulk_rows(stream, file_format: str):
+    """Yield (row_number, raw dict) from a binary CSV, JSON array or NDJSON stream.
+
+    An unparseable NDJSON line is yielded as (row_number, ValueError) so the rows
+    around it still import.
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if file_format == "csv":
+        for row_number, row in enumerate(csv.DictReader(text), start=1):
+            # Empty cells fall back to the model defaults
+            yield row_number, {k: v for k, v in row.items() if k and v not in ("", None)}
+    elif file_format == "ndjson":
+        for row_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                row = ValueError(f"Invalid JSON: {e.msg}")
+            yield row_number, row
+    else:
+        rows = json.load(text)
+        if not isinstance(rows, list):
+            raise ValueError("JSON import must be an array of rows")
+        yield from enumerate(rows, start=1)
+
+def bulk_file_format(upload: UploadFile, requested: Optional[str]):
+    if requested:
+        return requested
+    name = (upload.filename or "").lower()
+    if name.endswith(".csv") or upload.content_type == "text/csv":
+        return "csv"
+    if name.endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    return "json"
+
+@app.post("/api/players/bulk")
+async def bulk_import_players(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern="^(csv|json|ndjson)$"),
+    league_id: str = Depends(get_league_id),
+):
+    """Import players from a CSV/JSON/NDJSON file with unordered batched inserts, reporting errors per row"""
+    file_format = bulk_file_format(file, format)
+    inserted = 0
+    errors = []
+    roles = set()
+    batch, batch_rows = [], []
+    row_number = 0
+    
+    async def flush():
+        nonlocal inserted
+        failed = set()
+        try:
+            result = await players_collection.insert_many(batch, ordered=False)
+            inserted += len(result.inserted_ids)
+        except BulkWriteError as e:
+            inserted += e.details.get("nInserted", 0)
+            for write_error in e.details.get("writeErrors", []):
+                failed.add(write_error["index"])
+                errors.append({"row": batch_rows[write_error["index"]], "errors": [write_error.get("errmsg", "write error")]})
+        written = [doc for index, doc in enumerate(batch) if index not in failed]
+        await budget_ledger.apply(after=written)
+        # insert_many added the storage _id to each document
+        await audit_log.append(*({"type": "player", "op": "created", "league_id": league_id,
+                                  "player": {k: v for k, v in doc.items() if k != "_id"}} for doc in written))
+        batch.clear()
+        batch_rows.clear()
+    
+    try:
+        try:
+            for row_number, row in iter_bulk_rows(file.file, file_format):
+                if isinstance(row, ValueError):
+                    errors.append({"row": row_number, "errors": [str(row)]})
+                    continue
+                try:
+                    player = Player(**{**row, "league_id": league_id})
+                except (ValidationError, TypeError) as e:
+                    details = e.errors(include_url=False) if isinstance(e, ValidationError) else [{"msg": str(e)}]
+                    errors.append({"row": row_number, "errors": [
+                        f"{'.'.join(str(part) for part in d.get('loc', ()))}: {d['msg']}".lstrip(": ") for d in details]})
+                    continue
+                batch.append(player.dict())
+                batch_rows.append(row_number)
+                roles.add(player.role)
+                if len(batch) >= BULK_BATCH_SIZE:
+                    await flush()
+        except (ValueError, csv.Error) as e:
+            if not inserted:
+                raise HTTPException(status_code=400, detail=f"Could not parse {file_format} file: {e}")
+            # Earlier batches are committed: keep the rows read so far and report where parsing stopped
+            errors.append({"row": row_number + 1, "errors": [f"Could not parse {file_format} file: {e}"]})
+        if batch:
+            await flush()
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if inserted:
+            invalidate_player_reads(league_id, *roles)
+            # Too many rows for per-player deltas: ask clients to refetch once
+            publish_change({"type": "resync", "league_id": league_id})
+    
+    errors.sort(key=lambda error: error["row"])
+    return {
+        "inserted": inserted,
+        "failed": len(errors),
+        "errors": errors[:BULK_MAX_REPORTED_ERRORS],
+    }
+
+EXPORT_FIELDS = list(Player.model_fields)
+
+async def stream_players_csv(cursor):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    async for doc in cursor:
+        writer.writerow({k: (v.isoformat() if isinstance(v, datetime) else v) for k, v in doc.items()})
+        if buffer.tell() > 64 * 1024:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+async def stream_players_json(cursor):
+    yield b"["
+    first = True
+    async for doc in cursor:
+        yield (b"" if first else b",") + dumps(doc)
+        first = False
+    yield b"]"
+
+@app.get("/api/players/export")
+async def export_players(format: str = Query("json", pattern="^(csv|json|ndjson)$"),
+                         league_id: str = Depends(get_league_id)):
+    """Stream every player of the league as CSV, a JSON array or NDJSON"""
+    cursor = players_collection.find({"league_id": league_id}, {"_id": 0}).sort([("created_at", 1), ("id", 1)]).batch_size(NDJSON_BATCH_SIZE)
+    if format == "csv":
+        body, media_type = stream_players_csv(cursor), "text/csv"
+    elif format == "ndjson":
+        body, media_type = stream_ndjson(cursor), "application/x-ndjson"
+    else:
+        body, media_type = stream_players_json(cursor), "application/json"
+    return StreamingResponse(body, media_type=media_type, headers={
+        "Content-Disposition": f'attachment; filename="players.{format}"'})
+
+# Per-matchday player statistics, one columnar file per season (shared by every league)
+STATS_DIR = os.environ.get('STATS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stats'))
+stats_store = None
+
+def get_stats_store():
+    """The stats store, created on first use so NumPy stays out of startup"""
+    global stats_store
+    if stats_store is None:
+        from stats import StatsStore
+
+        stats_store = StatsStore(STATS_DIR)
+    return stats_store
+
+@app.post("/api/stats/import")
+async def import_stats(
+    season: str = Query(..., description="Season the rows belong to, e.g. 2024-25"),
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern="^(csv|json|ndjson)$"),
+):
+    """Ingest per-matchday rows (matchday, name, team, minutes, goals, assists, penalties, cards, rating).
+
+    The matchdays in the file replace the stored ones, so a whole season or a single
+    matchday can be loaded and re-imported safely.
+    """
+    file_format = bulk_file_format(file, format)
+    try:
+        store = get_stats_store()
+        report = await asyncio.to_thread(store.ingest, season, iter_bulk_rows(file.file, file_format))
+    except (ValueError, csv.Error) as e:
+        raise HTTPException(status_code=400, detail=f"Could not import {file_format} file: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    report["errors"] = report["errors"][:BULK_MAX_REPORTED_ERRORS]
+    return report
+
+@app.delete("/api/stats/{season}")
+async def delete_stats_season(season: str):
+    """Remove every stored matchday of a season"""
+    try:
+        deleted = await asyncio.to_thread(get_stats_store().delete, season)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Season not found")
+    return {"message": "Season deleted successfully"}
+
+# Declared after /api/players/search and /api/players/export, which would otherwise match as player ids
+@app.get("/api/players/{player_id}", response_model=Player)
+async def get_player(player_id: str, league_id: str = Depends(get_league_id)):
+    """A single player with its current version, e.g. to refresh an edit form after a 409"""
+    try:
+        player = await players_collection.find_one({"id": player_id, "league_id": league_id}, {"_id": 0})
+        if player is None:
+            raise HTTPException(status_code=404, detail="Player not found")
+        return player
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/players/{player_id}/stats")
+async def get_player_stats(player_id: str, season: Optional[str] = None, league_id: str = Depends(get_league_id)):
+    """Season totals, last-5 form, per-90 rates and per-matchday rows of a player (latest season by default)"""
+    try:
+        player = await players_collection.find_one({"id": player_id, "league_id": league_id},
+                                                   {"_id": 0, "name": 1, "team": 1})
+        if player is None:
+            raise HTTPException(status_code=404, detail="Player not found")
+        # Loading a season file and aggregating it is blocking NumPy work
+        stats = await asyncio.to_thread(get_stats_store().player_stats, player.get("name"), player.get("team"), season)
+        if stats is None:
+            raise HTTPException(status_code=404, detail="No stats for this player")
+        return {"player_id": player_id, **stats}
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def naive_utc(timestamp):
+    """Stored datetimes are naive UTC; convert aware query timestamps before comparing"""
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
 @app.get("/api/budget")
-async def get_budget():
-    """Get current budget configuration"""
-    try:
-        budget = budgets_collection.find_one({}, {"_id": 0}, sort=[("created_at", -1)])
-        if not budget:
-            # Create default budget
-            default_budget = BudgetConfig()
-            budgets_collection.insert_one(default_budget.dict())
-            return default_budget.dict()
+async def get_budget(
+    request: Request,
+    response: Response,
+    at: Optional[datetime] = Query(None, description="Return the budget that was current at this time"),
+    league_id: str = Depends(get_league_id),
+):
+    """Get current budget configuration, or the one in force at a past time"""
+    if at is not None:
+        try:
+            budget = await budget_history.at(league_id, naive_utc(at))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        if budget is None:
+            raise HTTPException(status_code=404, detail="No budget version at that time")
         return budget
+    not_modified = conditional_get(request, response, league_id, "budgets")
+    if not_modified:
+        return not_modified
+    try:
+        return await read_cache.get_or_load(("budget", league_id), lambda: load_current_budget(league_id))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/budget/history")
+async def get_budget_history(limit: int = Query(50, ge=1, le=1000), league_id: str = Depends(get_league_id)):
+    """Saved budget versions of the league, newest first"""
+    try:
+        return await budget_history.versions(league_id, limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/budget/history/compact")
+async def compact_budget_history(
+    keep_versions: int = Query(BUDGET_HISTORY_KEEP_VERSIONS or 10, ge=1),
+    keep_days: Optional[float] = Query(None, ge=0),
+    league_id: str = Depends(get_league_id),
+):
+    """Delete budget versions older than the newest `keep_versions` (and than `keep_days`, when given)"""
+    try:
+        deleted = await budget_history.compact(league_id, keep_versions, keep_days)
+        return {"message": "Budget history compacted", "deleted": deleted}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.put("/api/budget")
-async def update_budget(budget_request: UpdateBudgetRequest):
+async def update_budget(budget_request: UpdateBudgetRequest, league_id: str = Depends(get_league_id)):
     """Update budget configuration"""
     try:
-        budget = BudgetConfig(**budget_request.dict())
-        budgets_collection.insert_one(budget.dict())
-        return budget.dict()
+        budget = await budget_history.record(BudgetConfig(**budget_request.dict(), league_id=league_id).dict())
+        invalidate_budget_reads(league_id)
+        event = {"type": "budget", "op": "updated", "league_id": league_id, "budget": budget}
+        publish_change(event)
+        await audit_log.append(event)
+        return budget
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def get_latest_budget(league_id=DEFAULT_LEAGUE):
+    """Return the league's current budget configuration, or None if none was saved yet"""
+    return await budget_history.current(league_id)
+
+async def build_budget_summary(league_id):
+    """Per-role allocated/spent/remaining figures for the league's current budget"""
+    # Budget lookup and the per-role ledger read run concurrently
+    budget, role_totals = await asyncio.gather(get_latest_budget(league_id), budget_ledger.totals(league_id))
+    if not budget:
+        budget = BudgetConfig(league_id=league_id).dict()
+    return summarize_budget(budget, role_totals)
+
+def summarize_budget(budget, role_totals):
+    """Summary figures of `budget` against the ledger's per-role totals"""
+    summary = {
+        "total_budget": budget["total_budget"],
+        "roles": {}
+    }
+    
+    total_spent = 0
+    total_max_desired = 0
+    
+    for role in ROLES:
+        totals = role_totals.get(role, {})
+        spent = totals.get("spent", 0)
+        max_desired = totals.get("max_desired_total", 0)
+        allocated = budget.get(f"{role}_budget", 0)
+        
+        summary["roles"][role] = {
+            "allocated": allocated,
+            "spent": spent,
+            "remaining": allocated - spent,
+            "overflow": max(0, spent - allocated),
+            "max_desired_total": max_desired,
+            "player_count": int(totals.get("player_count", 0)),
+            "primary_choices_count": int(totals.get("primary_choices_count", 0))
+        }
+        total_spent += spent
+        total_max_desired += max_desired
+    
+    summary["total_spent"] = total_spent
+    summary["total_remaining"] = budget["total_budget"] - total_spent
+    summary["total_max_desired"] = total_max_desired
+    
+    return summary
+
 @app.get("/api/budget/summary")
-async def get_budget_summary():
+async def get_budget_summary(request: Request, response: Response, league_id: str = Depends(get_league_id)):
     """Get budget summary with spent amounts and max desired totals (only for primary choices)"""
+    not_modified = conditional_get(request, response, league_id, "players", "budgets")
+    if not_modified:
+        return not_modified
     try:
-        # Get current budget
-        budget = budgets_collection.find_one({}, {"_id": 0}, sort=[("created_at", -1)])
-        if not budget:
-            budget = BudgetConfig().dict()
-        
-        # Calculate spent amounts and max desired by role
-        roles = ["portiere", "difensore", "centrocampista", "attaccante"]
-        summary = {
-            "total_budget": budget["total_budget"],
-            "roles": {}
+        return await read_cache.get_or_load(("budget_summary", league_id), lambda: build_budget_summary(league_id))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def diff_values(before, after):
+    """Recursive {from, to, delta} view of the numeric fields of two summaries"""
+    if isinstance(before, dict):
+        return {key: diff_values(before[key], after[key]) for key in before}
+    return {"from": before, "to": after, "delta": after - before}
+
+@app.get("/api/budget/summary/diff")
+async def get_budget_summary_diff(
+    from_version: int = Query(..., alias="from", ge=1),
+    to_version: Optional[int] = Query(None, alias="to", ge=1),
+    league_id: str = Depends(get_league_id),
+):
+    """How the summary changes between two budget versions, against the current spending"""
+    try:
+        budget_from, budget_to, role_totals = await asyncio.gather(
+            budget_history.version(league_id, from_version),
+            budget_history.version(league_id, to_version) if to_version else get_latest_budget(league_id),
+            budget_ledger.totals(league_id),
+        )
+        if budget_from is None or budget_to is None:
+            raise HTTPException(status_code=404, detail="Budget version not found")
+        return {
+            "from": budget_from["version"],
+            "to": budget_to["version"],
+            "summary": diff_values(summarize_budget(budget_from, role_totals), summarize_budget(budget_to, role_totals)),
         }
-        
-        total_spent = 0
-        total_max_desired = 0
-        
-        for role in roles:
-            # Get all players for spent calculation
-            all_players = list(players_collection.find({"role": role}, {"price_paid": 1, "max_desired_price": 1, "is_primary_choice": 1}))
-            spent = sum(player.get("price_paid", 0) for player in all_players)
-            
-            # Get only primary choices for max desired calculation
-            primary_players = [p for p in all_players if p.get("is_primary_choice", True)]
-            max_desired = sum(player.get("max_desired_price", 0) for player in primary_players)
-            
-            allocated = budget.get(f"{role}_budget", 0)
-            
-            summary["roles"][role] = {
-                "allocated": allocated,
-                "spent": spent,
-                "remaining": allocated - spent,
-                "overflow": max(0, spent - allocated),
-                "max_desired_total": max_desired,
-                "player_count": len(all_players),
-                "primary_choices_count": len(primary_players)
-            }
-            total_spent += spent
-            total_max_desired += max_desired
-        
-        summary["total_spent"] = total_spent
-        summary["total_remaining"] = budget["total_budget"] - total_spent
-        summary["total_max_desired"] = total_max_desired
-        
-        return summary
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/budget/ledger/rebuild")
+async def rebuild_budget_ledger(league_id: str = Depends(get_league_id)):
+    """Recompute the league's per-role ledger from the players collection"""
+    try:
+        totals = await budget_ledger.rebuild(league_id)
+        read_cache.invalidate(("budget_summary", league_id), ("dashboard", league_id))
+        collection_versions.bump(f"players:{league_id}")
+        return {"message": "Budget ledger rebuilt", "roles": totals[league_id]}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/players/primary/{role}")
-async def get_primary_players_by_role(role: str):
+async def get_primary_players_by_role(role: str, request: Request, response: Response,
+                                      league_id: str = Depends(get_league_id)):
     """Get only primary choice players by role for dropdown selection"""
+    not_modified = conditional_get(request, response, league_id, "players")
+    if not_modified:
+        return not_modified
     try:
-        players = list(players_collection.find({
-            "role": role, 
-            "is_primary_choice": True
-        }, {"_id": 0, "id": 1, "name": 1, "team": 1}))
-        return players
+        encoded = await read_cache.get_or_load(("players_primary", league_id, role), lambda: load_encoded(
+            players_collection.find({
+                "league_id": league_id,
+                "role": role, 
+                "is_primary_choice": True
+            }, {"_id": 0, "id": 1, "name": 1, "team": 1})))
+        return encoded.response(request, response.headers)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def parse_roles(roles):
+    """Roles of a comma separated ?roles= filter, None when absent"""
+    if roles is None:
+        return None
+    selected = [role.strip() for role in roles.split(",") if role.strip()]
+    unknown = [role for role in selected if role not in ROLES]
+    if unknown or not selected:
+        raise HTTPException(status_code=400, detail=f"Unknown role: {', '.join(unknown) or roles!r}")
+    return selected
+
+async def load_dashboard(league_id, roles=None):
+    """Players (of `roles`, or all), their primary choices per role, the budget and its summary.
+
+    Primary choices are picked out of the same players query, so the whole screen
+    costs one pass over the league's players; budget and summary come from the cache.
+    """
+    query = {"league_id": league_id}
+    if roles is not None:
+        query["role"] = {"$in": roles}
+    players, budget, summary = await asyncio.gather(
+        players_collection.find(query, {"_id": 0}).sort([("created_at", 1), ("id", 1)]).to_list(length=None),
+        read_cache.get_or_load(("budget", league_id), lambda: load_current_budget(league_id)),
+        read_cache.get_or_load(("budget_summary", league_id), lambda: build_budget_summary(league_id)),
+    )
+    primary_players = {role: [] for role in roles or ROLES}
+    for player in players:
+        if player.get("is_primary_choice") is True and player.get("role") in primary_players:
+            primary_players[player["role"]].append({"id": player["id"], "name": player["name"], "team": player["team"]})
+    return EncodedJSON({"players": players, "primary_players": primary_players, "budget": budget,
+                        "budget_summary": summary})
+
+@app.get("/api/dashboard")
+async def get_dashboard(
+    request: Request,
+    response: Response,
+    roles: Optional[str] = Query(None, description="Comma separated roles to include (default: every role)"),
+    league_id: str = Depends(get_league_id),
+):
+    """The main screen in one response, instead of /api/players, /api/budget, /api/budget/summary and
+    /api/players/primary/{role} for each role.
+
+    With ?roles= only those roles' players and primary choices are returned (budget and summary
+    always cover the whole league), so a client can refresh just the roles a write touched.
+    """
+    selected = parse_roles(roles)
+    not_modified = conditional_get(request, response, league_id, "players", "budgets")
+    if not_modified:
+        return not_modified
+    try:
+        if selected is None:
+            encoded = await read_cache.get_or_load(("dashboard", league_id), lambda: load_dashboard(league_id))
+        else:
+            encoded = await load_dashboard(league_id, selected)
+        return encoded.response(request, response.headers)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/strategy/optimize")
+async def optimize_strategy(request: Optional[StrategyRequest] = None, league_id: str = Depends(get_league_id)):
+    """Best-value squad within the role budgets and the total budget"""
+    from strategy import STRATEGY_PROJECTION, optimize_squad
+
+    request = request or StrategyRequest()
+    try:
+        players, budget = await asyncio.gather(
+            players_collection.find({"league_id": league_id}, STRATEGY_PROJECTION).to_list(length=None),
+            read_cache.get_or_load(("budget", league_id), lambda: load_current_budget(league_id)),
+        )
+        # NumPy work runs off the event loop so other requests keep flowing
+        return await asyncio.to_thread(
+            optimize_squad, players, budget, request.weights.dict(), request.slots, request.primary_only)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def ensure_auction_planner(league_id):
+    """The league's planner, loaded from Mongo on first use or after a resync event"""
+    planner = auction_planners[league_id]
+    if planner.loaded:
+        return planner
+    async with auction_planner_lock:
+        if not planner.loaded:
+            from strategy import STRATEGY_PROJECTION
+
+            planner.begin_load()
+            try:
+                players, budget = await asyncio.gather(
+                    players_collection.find({"league_id": league_id}, STRATEGY_PROJECTION).to_list(length=None),
+                    read_cache.get_or_load(("budget", league_id), lambda: load_current_budget(league_id)),
+                )
+            except BaseException:
+                planner.abort_load()
+                raise
+            planner.load(players, budget)
+    return planner
+
+@app.get("/api/strategy/next")
+async def get_next_targets(role: Optional[str] = None, league_id: str = Depends(get_league_id)):
+    """Next player to bid on per role, with backups promoted as primaries are bought or removed"""
+    if role is not None and role not in ROLES:
+        raise HTTPException(status_code=404, detail="Unknown role")
+    try:
+        planner = await ensure_auction_planner(league_id)
+        return planner.recommend(role)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/events")
+async def stream_events(league_id: str = Depends(get_league_id)):
+    """Server-Sent Events feed of the league's player and budget changes"""
+    return StreamingResponse(change_broker.sse_stream(league_id), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    """Hit/miss counters of the read cache"""
+    return read_cache.stats()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
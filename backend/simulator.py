@@ -0,0 +1,150 @@
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from ledger import ROLES
+from strategy import DEFAULT_SLOTS
+
+# Rival bidding models. Each rival's ceiling for a player is drawn around the
+# player's reference price (our max_desired_price, at least 1):
+#   uniform    - anywhere between 50% and 150% of the reference
+#   lognormal  - right-skewed, occasional big overbids
+#   aggressive - lognormal shifted up ~25%, for leagues that overspend early
+RIVAL_MODELS = ("uniform", "lognormal", "aggressive")
+
+
+def draw_rival_ceilings(rng, reference, rivals, model, spread):
+    """(rivals, players) matrix of rival maximum bids"""
+    shape = (rivals, len(reference))
+    if model == "uniform":
+        factors = rng.uniform(1.0 - spread, 1.0 + spread, size=shape)
+    elif model == "lognormal":
+        factors = rng.lognormal(mean=0.0, sigma=spread, size=shape)
+    elif model == "aggressive":
+        factors = rng.lognormal(mean=math.log(1.25), sigma=spread, size=shape)
+    else:
+        raise ValueError(f"Unknown rival model: {model}")
+    return np.floor(reference[None, :] * factors)
+
+
+def slot_of(player):
+    """The slot a player fills: its own for a primary, its primary's for a related backup"""
+    if player.get("is_primary_choice", True) is not False:
+        return player["id"]
+    return player.get("related_to_player_id") or player["id"]
+
+
+def prepare_inputs(players_by_role, budget, slots=None):
+    """Turn stored player documents into the arrays the simulation needs.
+
+    `players_by_role` maps each role to its watchlist in bid order (as returned by
+    /api/players/role/{role}: each primary followed by its backups).
+    """
+    slots = {**DEFAULT_SLOTS, **(slots or {})}
+    roles = {}
+    for role in ROLES:
+        watchlist = players_by_role.get(role, [])
+        owned = [p for p in watchlist if (p.get("price_paid") or 0) > 0]
+        # A slot already filled is not bid on again, through its primary or any of its backups
+        owned_slots = {slot_of(p) for p in owned}
+        ordered = [p for p in watchlist if not (p.get("price_paid") or 0) > 0 and slot_of(p) not in owned_slots]
+        roles[role] = {
+            "ids": [p["id"] for p in ordered],
+            "names": [p.get("name") for p in ordered],
+            "max_price": np.array([p.get("max_desired_price") or 0 for p in ordered], dtype=np.float64),
+            "primary": np.array([p.get("is_primary_choice", True) is not False for p in ordered], dtype=bool),
+            "slot": [slot_of(p) for p in ordered],
+            "allocated": float(budget.get(f"{role}_budget", 0)),
+            "already_spent": float(sum(p["price_paid"] for p in owned)),
+            "open_slots": max(0, slots[role] - len(owned)),
+        }
+    return roles
+
+
+def simulate_batch(roles, runs, rivals, model, spread, seed):
+    """Play `runs` auctions; returns per-role spend samples and primary win counts.
+
+    Each run draws every rival ceiling for every player at once. We bid along
+    the watchlist up to each player's max desired price, ignoring the role
+    budget (that is what is being stress-tested), and win when we beat the best
+    rival ceiling, paying one credit over it. Winning any player of a slot
+    (primary or backup) closes the slot.
+    """
+    rng = np.random.default_rng(seed)
+    spend = {role: np.zeros(runs) for role in roles}
+    primary_wins = {role: np.zeros(len(data["ids"]), dtype=np.int64) for role, data in roles.items()}
+    for role, data in roles.items():
+        n = len(data["ids"])
+        if n == 0 or data["open_slots"] == 0:
+            # Nothing to bid on: any open slots are still filled at 1 credit each
+            spend[role][:] = data["already_spent"] + data["open_slots"]
+            continue
+        reference = np.maximum(1.0, data["max_price"])
+        slot_codes = np.unique(np.array(data["slot"]), return_inverse=True)[1]
+        for run in range(runs):
+            ceilings = draw_rival_ceilings(rng, reference, rivals, model, spread).max(axis=0)
+            prices = ceilings + 1
+            wanted = data["max_price"] >= prices
+            spent = data["already_spent"]
+            bought = 0
+            closed = np.zeros(slot_codes.max() + 1, dtype=bool)
+            for i in np.flatnonzero(wanted):
+                if bought >= data["open_slots"]:
+                    break
+                if closed[slot_codes[i]]:
+                    continue
+                spent += prices[i]
+                bought += 1
+                closed[slot_codes[i]] = True
+                if data["primary"][i]:
+                    primary_wins[role][i] += 1
+            # Slots left empty are filled at the minimum price of 1 credit
+            spent += data["open_slots"] - bought
+            spend[role][run] = spent
+    return spend, primary_wins
+
+
+def run_simulation(players_by_role, budget, runs=10000, rivals=7, model="lognormal", spread=0.35,
+                   workers=None, seed=0, slots=None):
+    """Spread `runs` auctions over a process pool and summarize overspend and primary landing odds"""
+    if model not in RIVAL_MODELS:
+        raise ValueError(f"Unknown rival model: {model}")
+    roles = prepare_inputs(players_by_role, budget, slots)
+    workers = max(1, min(workers or os.cpu_count() or 1, runs))
+    chunks = [runs // workers + (1 if i < runs % workers else 0) for i in range(workers)]
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+
+    if workers == 1:
+        results = [simulate_batch(roles, chunks[0], rivals, model, spread, seeds[0])]
+    else:
+        # spawn: workers must not inherit the parent's Mongo client sockets
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = [pool.submit(simulate_batch, roles, chunk, rivals, model, spread, chunk_seed)
+                       for chunk, chunk_seed in zip(chunks, seeds) if chunk]
+            results = [future.result() for future in futures]
+
+    report = {"runs": runs, "rivals": rivals, "model": model, "spread": spread, "roles": {}}
+    for role, data in roles.items():
+        spend = np.concatenate([result[0][role] for result in results])
+        wins = sum(result[1][role] for result in results)
+        overspend = spend - data["allocated"]
+        report["roles"][role] = {
+            "allocated": data["allocated"],
+            "mean_spend": float(spend.mean()),
+            "overspend": {
+                "probability": float((overspend > 0).mean()),
+                "mean": float(np.clip(overspend, 0, None).mean()),
+                "p50": float(np.percentile(overspend, 50)),
+                "p90": float(np.percentile(overspend, 90)),
+                "p99": float(np.percentile(overspend, 99)),
+            },
+            "primary_choices": [
+                {"id": player_id, "name": name, "landing_probability": float(count) / runs}
+                for player_id, name, count, is_primary in zip(data["ids"], data["names"], wins, data["primary"])
+                if is_primary
+            ],
+        }
+    return report
@@ -0,0 +1,754 @@
+import asyncio
+import json
+import re
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from pymongo.results import BulkWriteResult, DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+# Datetimes are stored as this marker followed by the naive UTC ISO timestamp (fixed
+# microsecond width), so they round-trip and compare/sort chronologically as text
+DATE_MARK = "\ufdd0"
+FIELD_PART = re.compile(r"^[A-Za-z0-9_]+$")
+COMPARISONS = {"$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+DEFAULT_BATCH_SIZE = 1000
+
+
+def _encode_datetime(value):
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return DATE_MARK + value.isoformat(timespec="microseconds")
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return _encode_datetime(value)
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _dumps(doc):
+    body = {key: value for key, value in doc.items() if key != "_id"}
+    if orjson is not None:
+        return orjson.dumps(body, default=_default, option=orjson.OPT_PASSTHROUGH_DATETIME).decode()
+    return json.dumps(body, default=_default, separators=(",", ":"), ensure_ascii=False)
+
+
+def _restore_value(value):
+    if isinstance(value, str) and value.startswith(DATE_MARK):
+        return datetime.fromisoformat(value[1:])
+    return value
+
+
+def _restore(container):
+    """Turn marked strings back into datetimes, in place"""
+    for key, item in (container.items() if isinstance(container, dict) else enumerate(container)):
+        if item.__class__ is str:
+            if item[:1] == DATE_MARK:
+                container[key] = datetime.fromisoformat(item[1:])
+        elif isinstance(item, (dict, list)):
+            _restore(item)
+    return container
+
+
+def _loads(text):
+    doc = orjson.loads(text) if orjson is not None else json.loads(text)
+    return _restore(doc) if DATE_MARK in text else doc
+
+
+def _param(value):
+    if isinstance(value, datetime):
+        return _encode_datetime(value)
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (dict, list)):
+        raise OperationFailure("Matching whole embedded documents or arrays is not supported")
+    return value
+
+
+def _field_sql(field):
+    """SQL expression of a (dotted) document field; identical text in queries and indexes so indexes are used"""
+    if field == "_id":
+        return "_id"
+    if not all(FIELD_PART.match(part) for part in field.split(".")):
+        raise OperationFailure(f"Unsupported field name {field!r}")
+    return f"json_extract(doc, '$.{field}')"
+
+
+def _compile_condition(field, condition):
+    column = _field_sql(field)
+    if not (isinstance(condition, dict) and condition and all(key.startswith("$") for key in condition)):
+        condition = {"$eq": condition}
+    clauses, params = [], []
+    for operator, value in condition.items():
+        if operator == "$eq":
+            if value is None:
+                clauses.append(f"{column} IS NULL")
+            else:
+                clauses.append(f"{column} = ?")
+                params.append(_param(value))
+        elif operator == "$ne":
+            if value is None:
+                clauses.append(f"{column} IS NOT NULL")
+            else:
+                clauses.append(f"({column} IS NULL OR {column} != ?)")
+                params.append(_param(value))
+        elif operator in COMPARISONS:
+            clauses.append(f"{column} {COMPARISONS[operator]} ?")
+            params.append(_param(value))
+        elif operator in ("$in", "$nin"):
+            values = [_param(item) for item in value if item is not None]
+            listed = f"{column} IN ({', '.join('?' * len(values))})" if values else "0"
+            if operator == "$in":
+                clauses.append(f"({listed} OR {column} IS NULL)" if None in value else listed)
+            else:
+                clauses.append(f"NOT ({listed})" if None in value else f"({column} IS NULL OR NOT ({listed}))")
+            params.extend(values)
+        elif operator == "$exists":
+            if field == "_id":
+                clauses.append("1" if value else "0")
+            else:
+                clauses.append(f"json_type(doc, '$.{field}') IS {'NOT ' if value else ''}NULL")
+        else:
+            raise OperationFailure(f"Unsupported query operator {operator}")
+    return " AND ".join(clauses), params
+
+
+def _compile_filter(query):
+    """(WHERE clause, params) for a Mongo-style filter"""
+    clauses, params = [], []
+    for key, condition in (query or {}).items():
+        if key in ("$or", "$and"):
+            if not condition:
+                raise OperationFailure(f"{key} needs a non-empty list")
+            compiled = [_compile_filter(sub) for sub in condition]
+            joiner = " OR " if key == "$or" else " AND "
+            clauses.append("(" + joiner.join(f"({sql})" for sql, _ in compiled) + ")")
+            for _, sub_params in compiled:
+                params.extend(sub_params)
+        elif key.startswith("$"):
+            raise OperationFailure(f"Unsupported query operator {key}")
+        else:
+            sql, condition_params = _compile_condition(key, condition)
+            clauses.append(sql)
+            params.extend(condition_params)
+    return " AND ".join(clauses) or "1", params
+
+
+def _compile_sort(sort):
+    if not sort:
+        return ""
+    return " ORDER BY " + ", ".join(f"{_field_sql(field)} {'DESC' if direction == -1 else 'ASC'}"
+                                    for field, direction in sort)
+
+
+def _project(doc, projection):
+    if not projection:
+        return doc
+    if isinstance(projection, (list, tuple)):
+        projection = dict.fromkeys(projection, 1)
+    included = {key for key, value in projection.items() if value and key != "_id"}
+    if included:
+        if projection.get("_id", 1):
+            included.add("_id")
+        return {key: value for key, value in doc.items() if key in included}
+    excluded = {key for key, value in projection.items() if not value}
+    return {key: value for key, value in doc.items() if key not in excluded}
+
+
+def _get_path(doc, path):
+    for part in path.split("."):
+        if not isinstance(doc, dict):
+            return None
+        doc = doc.get(part)
+    return doc
+
+
+def _set_path(doc, path, value):
+    *parents, last = path.split(".")
+    for part in parents:
+        doc = doc.setdefault(part, {})
+    doc[last] = value
+
+
+def _apply_update(doc, update, inserting=False):
+    """The document after a replacement or a $set/$inc/$unset/$setOnInsert update"""
+    if not any(key.startswith("$") for key in update):
+        return {"_id": doc["_id"], **{key: value for key, value in update.items() if key != "_id"}}
+    doc = _copy(doc)
+    for operator, fields in update.items():
+        if operator == "$setOnInsert" and not inserting:
+            continue
+        for path, value in fields.items():
+            if operator in ("$set", "$setOnInsert"):
+                _set_path(doc, path, value)
+            elif operator == "$inc":
+                _set_path(doc, path, (_get_path(doc, path) or 0) + value)
+            elif operator == "$unset":
+                *parents, last = path.split(".")
+                parent = _get_path(doc, ".".join(parents)) if parents else doc
+                if isinstance(parent, dict):
+                    parent.pop(last, None)
+            else:
+                raise OperationFailure(f"Unsupported update operator {operator}")
+    return doc
+
+
+def _copy(doc):
+    return {key: _copy(value) if isinstance(value, dict) else value for key, value in doc.items()}
+
+
+def _upsert_seed(query):
+    """Equality fields of a filter, which an upsert copies into the inserted document"""
+    doc = {}
+    for key, condition in query.items():
+        if key.startswith("$"):
+            continue
+        if isinstance(condition, dict) and any(op.startswith("$") for op in condition):
+            if "$eq" not in condition:
+                continue
+            condition = condition["$eq"]
+        _set_path(doc, key, condition)
+    return doc
+
+
+def _evaluate(expression, doc):
+    """Aggregation expression: "$field" references, literals, $cond, $eq and $ne"""
+    if isinstance(expression, str) and expression.startswith("$"):
+        return _get_path(doc, expression[1:])
+    if isinstance(expression, dict):
+        if len(expression) == 1 and next(iter(expression)).startswith("$"):
+            operator, args = next(iter(expression.items()))
+            if operator == "$cond":
+                if isinstance(args, dict):
+                    args = [args["if"], args["then"], args["else"]]
+                return _evaluate(args[1] if _evaluate(args[0], doc) else args[2], doc)
+            if operator in ("$eq", "$ne"):
+                left, right = (_evaluate(arg, doc) for arg in args)
+                return (left == right) == (operator == "$eq")
+            raise OperationFailure(f"Unsupported aggregation operator {operator}")
+        return {key: _evaluate(value, doc) for key, value in expression.items()}
+    return expression
+
+
+def _group(docs, spec):
+    groups = {}
+    for doc in docs:
+        group_id = _evaluate(spec["_id"], doc)
+        key = json.dumps(group_id, sort_keys=True, default=str)
+        row = groups.get(key)
+        if row is None:
+            row = groups[key] = {"_id": group_id, **{field: 0 for field in spec if field != "_id"}}
+        for field, accumulator in spec.items():
+            if field == "_id":
+                continue
+            operator, expression = next(iter(accumulator.items()))
+            if operator != "$sum":
+                raise OperationFailure(f"Unsupported accumulator {operator}")
+            value = _evaluate(expression, doc)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                row[field] += value
+    return list(groups.values())
+
+
+def _duplicate_key(collection, error):
+    return DuplicateKeyError(f"E11000 duplicate key error collection: {collection}: {error}", 11000)
+
+
+@contextmanager
+def _transaction(connection):
+    """BEGIN IMMEDIATE takes the write lock up front, so read-modify-write operations are atomic across processes"""
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        yield
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+    connection.execute("COMMIT")
+
+
+class SQLiteDatabase:
+    """Embedded storage with the slice of Motor's database/collection API the backend uses.
+
+    Each collection is a table of JSON documents keyed by an ObjectId string;
+    filters compile to SQL over json_extract() and create_indexes() builds
+    matching expression indexes, so the same routes, ledger and budget history
+    run unchanged on a single local file. All SQLite work happens on one worker
+    thread: the event loop never blocks on disk, and operations are serialized,
+    which keeps find_one_and_* and $inc upserts atomic within the process (and
+    BEGIN IMMEDIATE keeps them atomic across processes).
+    """
+
+    def __init__(self, path, synchronous="NORMAL", busy_timeout_ms=5000):
+        self.path = path
+        self.synchronous = synchronous
+        self.busy_timeout_ms = busy_timeout_ms
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-store")
+        self._connection = None
+        self._tables = set()
+        self._collections = {}
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def __getitem__(self, name):
+        if name not in self._collections:
+            self._collections[name] = SQLiteCollection(self, name)
+        return self._collections[name]
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(f"PRAGMA synchronous={self.synchronous}")
+        connection.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        connection.execute("PRAGMA temp_store=MEMORY")
+        connection.execute('CREATE TABLE IF NOT EXISTS "_indexes" (collection TEXT NOT NULL, name TEXT NOT NULL, '
+                           'keys TEXT NOT NULL, is_unique INTEGER NOT NULL, PRIMARY KEY (collection, name))')
+        self._connection = connection
+
+    def _call(self, function, args):
+        if self._connection is None:
+            self._connect()
+        return function(self._connection, *args)
+
+    async def run(self, function, *args):
+        """Run `function(connection, *args)` on the storage thread"""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._call, function, args)
+
+    def submit(self, function, *args):
+        return self._executor.submit(self._call, function, args)
+
+    def ensure_table(self, connection, name):
+        if name not in self._tables:
+            connection.execute(f'CREATE TABLE IF NOT EXISTS "{name}" (_id TEXT PRIMARY KEY, doc TEXT NOT NULL)')
+            self._tables.add(name)
+
+    async def command(self, name):
+        """Only "ping": opens the file if needed and runs a trivial query"""
+        if name != "ping":
+            raise OperationFailure(f"Unsupported command {name}")
+        await self.run(lambda connection: connection.execute("SELECT 1").fetchone())
+        return {"ok": 1.0}
+
+    async def list_collection_names(self):
+        def names(connection):
+            rows = connection.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE '\\_%' "
+                                      "ESCAPE '\\' AND name NOT LIKE 'sqlite%'").fetchall()
+            return [row[0] for row in rows]
+        return await self.run(names)
+
+    def close(self):
+        def close(connection):
+            connection.close()
+            self._connection = None
+        if self._connection is not None:
+            self.submit(close).result()
+        self._executor.shutdown(wait=True)
+
+
+class SQLiteCursor:
+    """Lazily executed find(), chainable like a Motor cursor"""
+
+    def __init__(self, collection, query, projection):
+        self.collection = collection
+        self.query = query
+        self.projection = projection
+        self._sort = []
+        self._skip = 0
+        self._limit = 0
+        self._batch_size = DEFAULT_BATCH_SIZE
+
+    def sort(self, key_or_list, direction=1):
+        self._sort = [(key_or_list, direction)] if isinstance(key_or_list, str) else list(key_or_list)
+        return self
+
+    def skip(self, count):
+        self._skip = count
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def batch_size(self, size):
+        self._batch_size = max(1, size)
+        return self
+
+    async def to_list(self, length=None):
+        limit = min(filter(None, (self._limit, length)), default=0)
+        return await self.collection.database.run(
+            self.collection._find, self.query, self.projection, self._sort, limit, self._skip)
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        collection = self.collection
+        statement = await collection.database.run(
+            collection._select, self.query, self._sort, self._limit, self._skip)
+        try:
+            while True:
+                docs = await collection.database.run(collection._fetch, statement, self.projection, self._batch_size)
+                if not docs:
+                    break
+                for doc in docs:
+                    yield doc
+        finally:
+            collection.database.submit(lambda connection: statement.close())
+
+
+class SQLiteAggregation:
+    def __init__(self, collection, pipeline):
+        self.collection = collection
+        self.pipeline = pipeline
+
+    async def to_list(self, length=None):
+        rows = await self.collection.database.run(self.collection._aggregate, self.pipeline)
+        return rows[:length] if length else rows
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for row in await self.to_list():
+            yield row
+
+
+class SQLiteCollection:
+    def __init__(self, database, name):
+        if not FIELD_PART.match(name) or name.startswith("_"):
+            raise OperationFailure(f"Invalid collection name {name!r}")
+        self.database = database
+        self.name = name
+        self.table = f'"{name}"'
+
+    # -- reads ---------------------------------------------------------------
+
+    def _select(self, connection, query, sort=None, limit=0, skip=0):
+        self.database.ensure_table(connection, self.name)
+        where, params = _compile_filter(query)
+        sql = f"SELECT _id, doc FROM {self.table} WHERE {where}{_compile_sort(sort)}"
+        if limit or skip:
+            sql += " LIMIT ? OFFSET ?"
+            params = params + [limit or -1, skip]
+        return connection.execute(sql, params)
+
+    @staticmethod
+    def _load(row, projection):
+        doc = _loads(row[1])
+        if not projection or (projection.get("_id", 1) if isinstance(projection, dict) else True):
+            doc = {"_id": ObjectId(row[0]), **doc}
+        elif len(projection) == 1:
+            return doc  # {"_id": 0}: the stored document already leaves it out
+        return _project(doc, projection)
+
+    def _fetch(self, connection, statement, projection, size):
+        return [self._load(row, projection) for row in statement.fetchmany(size)]
+
+    def _find(self, connection, query, projection=None, sort=None, limit=0, skip=0):
+        return [self._load(row, projection) for row in self._select(connection, query, sort, limit, skip)]
+
+    def find(self, filter=None, projection=None):
+        return SQLiteCursor(self, filter or {}, projection)
+
+    async def find_one(self, filter=None, projection=None, sort=None):
+        docs = await self.database.run(self._find, filter or {}, projection, sort, 1)
+        return docs[0] if docs else None
+
+    async def count_documents(self, filter, limit=0, skip=0):
+        def count(connection):
+            self.database.ensure_table(connection, self.name)
+            where, params = _compile_filter(filter)
+            sql = f"SELECT COUNT(*) FROM (SELECT 1 FROM {self.table} WHERE {where} LIMIT ? OFFSET ?)"
+            return connection.execute(sql, params + [limit or -1, skip]).fetchone()[0]
+        return await self.database.run(count)
+
+    async def distinct(self, key, filter=None):
+        def distinct(connection):
+            self.database.ensure_table(connection, self.name)
+            column = _field_sql(key)
+            where, params = _compile_filter(filter)
+            sql = f"SELECT DISTINCT {column} FROM {self.table} WHERE {where} AND {column} IS NOT NULL"
+            return [_restore_value(row[0]) for row in connection.execute(sql, params)]
+        return await self.database.run(distinct)
+
+    def _aggregate(self, connection, pipeline):
+        stages = list(pipeline)
+        matches = []
+        while stages and "$match" in stages[0]:
+            matches.append(stages.pop(0)["$match"])
+        docs = self._find(connection, {"$and": matches} if matches else {})
+        for stage in stages:
+            operator, spec = next(iter(stage.items()))
+            if operator == "$group":
+                docs = _group(docs, spec)
+            elif operator == "$sort":
+                for field, direction in reversed(list(spec.items())):
+                    docs.sort(key=lambda doc: (_get_path(doc, field) is not None, _get_path(doc, field)),
+                              reverse=direction == -1)
+            elif operator == "$limit":
+                docs = docs[:spec]
+            else:
+                raise OperationFailure(f"Unsupported aggregation stage {operator}")
+        return docs
+
+    def aggregate(self, pipeline):
+        return SQLiteAggregation(self, pipeline)
+
+    def watch(self, *args, **kwargs):
+        raise OperationFailure("Change streams are only available on MongoDB (use CHANGE_FEED_SOURCE=inprocess)")
+
+    # -- writes --------------------------------------------------------------
+
+    def _insert(self, connection, doc):
+        try:
+            connection.execute(f"INSERT INTO {self.table} (_id, doc) VALUES (?, ?)", (str(doc["_id"]), _dumps(doc)))
+        except sqlite3.IntegrityError as e:
+            raise _duplicate_key(self.name, e)
+
+    def _replace(self, connection, doc):
+        try:
+            connection.execute(f"UPDATE {self.table} SET doc = ? WHERE _id = ?", (_dumps(doc), str(doc["_id"])))
+        except sqlite3.IntegrityError as e:
+            raise _duplicate_key(self.name, e)
+
+    def _modify(self, connection, query, update, upsert=False, multi=False):
+        """Apply `update` (operators or a replacement) to the first or every match: (matched, modified, upserted_id)"""
+        self.database.ensure_table(connection, self.name)
+        rows = self._select(connection, query, limit=0 if multi else 1).fetchall()
+        if not rows:
+            if not upsert:
+                return 0, 0, None
+            doc = _apply_update({"_id": ObjectId(), **_upsert_seed(query)}, update, inserting=True)
+            self._insert(connection, doc)
+            return 0, 0, doc["_id"]
+        modified = 0
+        for row in rows:
+            before = self._load(row, None)
+            after = _apply_update(before, update)
+            if after != before:
+                self._replace(connection, after)
+                modified += 1
+        return len(rows), modified, None
+
+    async def insert_one(self, document):
+        document.setdefault("_id", ObjectId())
+
+        def insert(connection):
+            self.database.ensure_table(connection, self.name)
+            self._insert(connection, document)
+        await self.database.run(insert)
+        return InsertOneResult(document["_id"], True)
+
+    async def insert_many(self, documents, ordered=True):
+        documents = list(documents)
+        for document in documents:
+            document.setdefault("_id", ObjectId())
+
+        def insert(connection):
+            self.database.ensure_table(connection, self.name)
+            errors = []
+            with _transaction(connection):
+                for index, document in enumerate(documents):
+                    try:
+                        self._insert(connection, document)
+                    except DuplicateKeyError as e:
+                        errors.append({"index": index, "code": 11000, "errmsg": str(e), "op": document})
+                        if ordered:
+                            break
+            return errors
+        errors = await self.database.run(insert)
+        if errors:
+            inserted = (errors[0]["index"] if ordered else len(documents) - len(errors))
+            raise BulkWriteError({"writeErrors": errors, "writeConcernErrors": [], "nInserted": inserted,
+                                  "nUpserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0, "upserted": []})
+        return InsertManyResult([document["_id"] for document in documents], True)
+
+    async def _update(self, filter, update, upsert, multi):
+        def modify(connection):
+            self.database.ensure_table(connection, self.name)
+            with _transaction(connection):
+                return self._modify(connection, filter, update, upsert, multi)
+        matched, modified, upserted_id = await self.database.run(modify)
+        raw = {"n": matched or int(upserted_id is not None), "nModified": modified}
+        if upserted_id is not None:
+            raw["upserted"] = upserted_id
+        return UpdateResult(raw, True)
+
+    async def update_one(self, filter, update, upsert=False):
+        return await self._update(filter, update, upsert, multi=False)
+
+    async def update_many(self, filter, update, upsert=False):
+        return await self._update(filter, update, upsert, multi=True)
+
+    async def replace_one(self, filter, replacement, upsert=False):
+        return await self._update(filter, replacement, upsert, multi=False)
+
+    async def _find_one_and_modify(self, filter, update, projection, sort, upsert, return_after, remove=False):
+        def modify(connection):
+            self.database.ensure_table(connection, self.name)
+            with _transaction(connection):
+                rows = self._select(connection, filter, sort, limit=1).fetchall()
+                if not rows:
+                    if not upsert:
+                        return None
+                    doc = _apply_update({"_id": ObjectId(), **_upsert_seed(filter)}, update, inserting=True)
+                    self._insert(connection, doc)
+                    return _project(doc, projection) if return_after else None
+                before = self._load(rows[0], None)
+                if remove:
+                    connection.execute(f"DELETE FROM {self.table} WHERE _id = ?", (str(before["_id"]),))
+                    return _project(before, projection)
+                after = _apply_update(before, update)
+                self._replace(connection, after)
+                return _project(after if return_after else before, projection)
+        return await self.database.run(modify)
+
+    async def find_one_and_update(self, filter, update, projection=None, sort=None, upsert=False,
+                                  return_document=False):
+        return await self._find_one_and_modify(filter, update, projection, sort, upsert, bool(return_document))
+
+    async def find_one_and_replace(self, filter, replacement, projection=None, sort=None, upsert=False,
+                                   return_document=False):
+        return await self._find_one_and_modify(filter, replacement, projection, sort, upsert, bool(return_document))
+
+    async def find_one_and_delete(self, filter, projection=None, sort=None):
+        return await self._find_one_and_modify(filter, None, projection, sort, False, False, remove=True)
+
+    async def delete_many(self, filter):
+        def delete(connection):
+            self.database.ensure_table(connection, self.name)
+            where, params = _compile_filter(filter)
+            return connection.execute(f"DELETE FROM {self.table} WHERE {where}", params).rowcount
+        return DeleteResult({"n": await self.database.run(delete)}, True)
+
+    async def delete_one(self, filter):
+        def delete(connection):
+            self.database.ensure_table(connection, self.name)
+            where, params = _compile_filter(filter)
+            sql = f"DELETE FROM {self.table} WHERE _id IN (SELECT _id FROM {self.table} WHERE {where} LIMIT 1)"
+            return connection.execute(sql, params).rowcount
+        return DeleteResult({"n": await self.database.run(delete)}, True)
+
+    async def bulk_write(self, requests, ordered=True):
+        """InsertOne, ReplaceOne, UpdateOne/UpdateMany and DeleteOne/DeleteMany in one transaction"""
+        requests = list(requests)
+        for request in requests:
+            if type(request).__name__ == "InsertOne":
+                request._doc.setdefault("_id", ObjectId())
+
+        def write(connection):
+            self.database.ensure_table(connection, self.name)
+            result = {"writeErrors": [], "writeConcernErrors": [], "nInserted": 0, "nUpserted": 0, "nMatched": 0,
+                      "nModified": 0, "nRemoved": 0, "upserted": []}
+            with _transaction(connection):
+                for index, request in enumerate(requests):
+                    kind = type(request).__name__
+                    try:
+                        if kind == "InsertOne":
+                            self._insert(connection, request._doc)
+                            result["nInserted"] += 1
+                        elif kind in ("ReplaceOne", "UpdateOne", "UpdateMany"):
+                            matched, modified, upserted_id = self._modify(
+                                connection, request._filter, request._doc, request._upsert, kind == "UpdateMany")
+                            result["nMatched"] += matched
+                            result["nModified"] += modified
+                            if upserted_id is not None:
+                                result["nUpserted"] += 1
+                                result["upserted"].append({"index": index, "_id": upserted_id})
+                        elif kind in ("DeleteOne", "DeleteMany"):
+                            where, params = _compile_filter(request._filter)
+                            sql = f"DELETE FROM {self.table} WHERE {where}"
+                            if kind == "DeleteOne":
+                                sql = f"DELETE FROM {self.table} WHERE _id IN (SELECT _id FROM {self.table} " \
+                                      f"WHERE {where} LIMIT 1)"
+                            result["nRemoved"] += connection.execute(sql, params).rowcount
+                        else:
+                            raise OperationFailure(f"Unsupported bulk operation {kind}")
+                    except DuplicateKeyError as e:
+                        result["writeErrors"].append({"index": index, "code": 11000, "errmsg": str(e)})
+                        if ordered:
+                            break
+            return result
+        result = await self.database.run(write)
+        if result["writeErrors"]:
+            raise BulkWriteError(result)
+        return BulkWriteResult(result, True)
+
+    # -- indexes -------------------------------------------------------------
+
+    async def create_indexes(self, indexes):
+        def create(connection):
+            self.database.ensure_table(connection, self.name)
+            names = []
+            for model in indexes:
+                spec = model.document
+                keys = [[field, direction] for field, direction in spec["key"].items()]
+                name = spec.get("name") or "_".join(f"{field}_{direction}" for field, direction in keys)
+                unique = bool(spec.get("unique"))
+                existing = connection.execute('SELECT keys, is_unique FROM "_indexes" WHERE collection = ? AND name = ?',
+                                              (self.name, name)).fetchone()
+                if existing is not None:
+                    if json.loads(existing[0]) != keys or bool(existing[1]) != unique:
+                        raise OperationFailure(f"An index named {name} already exists with different options", 86)
+                    names.append(name)
+                    continue
+                columns = ", ".join(f"{_field_sql(field)} {'DESC' if direction == -1 else 'ASC'}"
+                                    for field, direction in keys)
+                with _transaction(connection):
+                    try:
+                        connection.execute(f'CREATE {"UNIQUE " if unique else ""}INDEX "{self.name}__{name}" '
+                                           f'ON {self.table} ({columns})')
+                    except sqlite3.IntegrityError as e:
+                        raise _duplicate_key(self.name, e)
+                    connection.execute('INSERT INTO "_indexes" (collection, name, keys, is_unique) VALUES (?, ?, ?, ?)',
+                                       (self.name, name, json.dumps(keys), int(unique)))
+                names.append(name)
+            return names
+        return await self.database.run(create)
+
+    async def create_index(self, keys, **options):
+        from pymongo import IndexModel
+
+        return (await self.create_indexes([IndexModel(keys, **options)]))[0]
+
+    async def index_information(self):
+        def information(connection):
+            rows = connection.execute('SELECT name, keys, is_unique FROM "_indexes" WHERE collection = ?', (self.name,))
+            info = {"_id_": {"key": [("_id", 1)]}}
+            for name, keys, unique in rows:
+                info[name] = {"key": [tuple(key) for key in json.loads(keys)]}
+                if unique:
+                    info[name]["unique"] = True
+            return info
+        return await self.database.run(information)
+
+    async def drop_index(self, name):
+        def drop(connection):
+            with _transaction(connection):
+                deleted = connection.execute('DELETE FROM "_indexes" WHERE collection = ? AND name = ?',
+                                             (self.name, name)).rowcount
+                if not deleted:
+                    raise OperationFailure(f"index not found with name [{name}]", 27)
+                connection.execute(f'DROP INDEX IF EXISTS "{self.name}__{name}"')
+        await self.database.run(drop)
+
+    async def drop(self):
+        def drop(connection):
+            with _transaction(connection):
+                connection.execute(f"DROP TABLE IF EXISTS {self.table}")
+                connection.execute('DELETE FROM "_indexes" WHERE collection = ?', (self.name,))
+            self.database._tables.discard(self.name)
+        await self.database.run(drop)
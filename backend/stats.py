@@ -0,0 +1,343 @@
+import math
+import os
+import re
+import threading
+
+import numpy as np
+
+from search import normalize
+
+# Per-matchday counters; a column missing from an ingested file counts as 0
+COUNT_FIELDS = ("minutes", "goals", "assists", "penalties_taken", "penalties_scored", "yellow_cards", "red_cards")
+# Fantacalcio bonus/malus added to the match rating to give the fantasy points of a matchday
+BONUS = {"goals": 3.0, "assists": 1.0, "yellow_cards": -0.5, "red_cards": -1.0}
+MISSED_PENALTY_MALUS = -3.0
+# Recorded matchdays the rolling "last 5" aggregates look back over
+FORM_WINDOW = 5
+MAX_MATCHDAY = 60
+# Ratings that mean the player was not rated ("senza voto")
+NO_RATING = {"", "s.v.", "sv", "-"}
+SEASON_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,32}$")
+# Leading year of season names like 2024-25 or 2024, which orders them
+SEASON_YEAR = re.compile(r"^(\d{4})(?!\d)")
+# Stored once per player; each row carries its player's index instead
+PLAYER_FIELDS = ("key", "name", "team")
+
+
+def player_key(name, team):
+    """Stats are keyed by accent- and case-insensitive name and team, as data feeds carry no player ids"""
+    return f"{normalize(name).strip()}|{normalize(team).strip()}"
+
+
+def _count(value, field):
+    if value in (None, ""):
+        return 0
+    try:
+        if isinstance(value, str):
+            try:
+                return int(value)
+            except ValueError:
+                value = float(value)
+        if isinstance(value, float) and not value.is_integer():
+            raise ValueError
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field}: expected a whole number, got {value!r}") from None
+
+
+def _number(value):
+    """Python float for JSON, None for a missing (NaN) value"""
+    value = float(value)
+    return None if math.isnan(value) else round(value, 3)
+
+
+def parse_rows(rows):
+    """Raw columns from (row_number, dict) pairs, plus per-row errors for the rows skipped"""
+    columns = {field: [] for field in ("key", "name", "team", "matchday", "rating") + COUNT_FIELDS}
+    errors = []
+    # A season file repeats every player once per matchday; normalize each name and team once
+    keys = {}
+    for row_number, row in rows:
+        try:
+            if isinstance(row, ValueError):  # a line the reader could not parse
+                raise row
+            name = str(row.get("name") or "").strip()
+            if not name:
+                raise ValueError("name: Field required")
+            team = str(row.get("team") or "").strip()
+            matchday = _count(row.get("matchday"), "matchday")
+            if not 1 <= matchday <= MAX_MATCHDAY:
+                raise ValueError(f"matchday: must be between 1 and {MAX_MATCHDAY}")
+            counts = [_count(row.get(field), field) for field in COUNT_FIELDS]
+            if min(counts) < 0:
+                raise ValueError(f"{COUNT_FIELDS[counts.index(min(counts))]}: must be >= 0")
+            if counts[COUNT_FIELDS.index("penalties_scored")] > counts[COUNT_FIELDS.index("penalties_taken")]:
+                raise ValueError("penalties_scored: cannot exceed penalties_taken")
+            rating = row.get("rating")
+            try:
+                no_rating = rating is None or (isinstance(rating, str) and rating.strip().lower() in NO_RATING)
+                rating = math.nan if no_rating else float(rating)
+            except (TypeError, ValueError):
+                raise ValueError(f"rating: expected a number, got {rating!r}") from None
+        except ValueError as e:
+            errors.append({"row": row_number, "errors": [str(e)]})
+            continue
+        key = keys.get((name, team))
+        if key is None:
+            key = keys[name, team] = player_key(name, team)
+        columns["key"].append(key)
+        columns["name"].append(name)
+        columns["team"].append(team)
+        columns["matchday"].append(matchday)
+        columns["rating"].append(rating)
+        for field, value in zip(COUNT_FIELDS, counts):
+            columns[field].append(value)
+    arrays = {field: np.array(columns[field], dtype=str) for field in ("key", "name", "team")}
+    arrays["matchday"] = np.array(columns["matchday"], dtype=np.int16)
+    arrays["rating"] = np.array(columns["rating"], dtype=np.float32)
+    for field in COUNT_FIELDS:
+        arrays[field] = np.array(columns[field], dtype=np.int16)
+    return arrays, errors
+
+
+def _rolling_sum(values, row_start, window=FORM_WINDOW):
+    """Sum of each row and the rows before it within its player's group, at most `window` rows"""
+    padded = np.concatenate(([0.0], np.cumsum(values, dtype=np.float64)))
+    end = np.arange(1, len(values) + 1)
+    return padded[end] - padded[np.maximum(end - window, row_start)]
+
+
+def _per_90(value, minutes):
+    return np.divide(value * 90.0, minutes, out=np.zeros(len(minutes)), where=minutes > 0)
+
+
+class SeasonStats:
+    """One season of per-matchday rows in columnar form, with the rolling aggregates precomputed.
+
+    Rows are sorted by player then matchday, so a player's rows are one contiguous
+    slice and every rolling window is a difference of two cumulative sums. `players`
+    holds the sorted keys with the name and team of each player.
+    """
+
+    def __init__(self, season, players, columns):
+        self.season = season
+        self.players = players
+        order = np.lexsort((columns["matchday"], columns["player"]))
+        self.rows = {field: column[order] for field, column in columns.items()}
+        # The stored columns; everything else in `rows` is derived from them
+        self.columns = dict(self.rows)
+        player = self.rows["player"]
+        keys = self.keys = players["key"]
+        self.starts = np.searchsorted(player, np.arange(len(keys)))
+        self.ends = np.append(self.starts[1:], len(player))
+        self.index = {key: code for code, key in enumerate(keys.tolist())}
+        self.by_name = {}
+        for key, code in self.index.items():
+            self.by_name.setdefault(key.split("|", 1)[0], []).append(code)
+
+        rows = self.rows
+        row_start = self.starts[player]
+        missed = rows["penalties_taken"] - rows["penalties_scored"]
+        bonus = sum(weight * rows[field] for field, weight in BONUS.items()) + MISSED_PENALTY_MALUS * missed
+        rated = ~np.isnan(rows["rating"])
+        rows["fantasy_points"] = np.where(rated, rows["rating"] + bonus, np.nan)
+
+        last5 = {field: _rolling_sum(rows[field], row_start) for field in ("minutes", "goals", "assists")}
+        rated_last5 = _rolling_sum(rated, row_start)
+        points_last5 = _rolling_sum(np.where(rated, rows["fantasy_points"], 0.0), row_start)
+        rows["form"] = np.divide(points_last5, rated_last5, out=np.full(len(player), np.nan), where=rated_last5 > 0)
+        for field, values in last5.items():
+            rows[f"{field}_last5"] = values
+        rows["goals_per_90_last5"] = _per_90(last5["goals"], last5["minutes"])
+
+        # Season totals per player, and the rolling values as of each player's latest matchday
+        if len(keys):
+            totals = {field: np.add.reduceat(rows[field].astype(np.int64), self.starts)
+                      for field in COUNT_FIELDS}
+            totals["rated"] = np.add.reduceat(rated.astype(np.int64), self.starts)
+            totals["rating"] = np.add.reduceat(np.where(rated, rows["rating"], 0.0), self.starts)
+            totals["fantasy_points"] = np.add.reduceat(np.where(rated, rows["fantasy_points"], 0.0), self.starts)
+        else:
+            totals = {field: np.zeros(0) for field in COUNT_FIELDS + ("rated", "rating", "fantasy_points")}
+        self.totals = totals
+        self.latest = self.ends - 1
+        self.goals_per_90 = _per_90(totals["goals"], totals["minutes"])
+        self.assists_per_90 = _per_90(totals["assists"], totals["minutes"])
+        self.penalty_conversion = np.divide(totals["penalties_scored"], totals["penalties_taken"],
+                                            out=np.full(len(keys), np.nan), where=totals["penalties_taken"] > 0)
+
+    def __len__(self):
+        return len(self.rows["matchday"])
+
+    def find(self, name, team):
+        """Player code for a name and team, falling back to the name alone when it is unambiguous"""
+        code = self.index.get(player_key(name, team))
+        if code is None:
+            candidates = self.by_name.get(normalize(name).strip(), ())
+            code = candidates[0] if len(candidates) == 1 else None
+        return code
+
+    def merge(self, columns):
+        """A new SeasonStats where the matchdays present in `columns` replace the stored ones"""
+        keep = ~np.isin(self.columns["matchday"], np.unique(columns["matchday"]))
+        stored = self.columns["player"][keep]
+        merged = {}
+        for field, column in columns.items():
+            previous = self.players[field][stored] if field in PLAYER_FIELDS else self.columns[field][keep]
+            merged[field] = np.concatenate([previous, column])
+        return SeasonStats.from_columns(self.season, merged)
+
+    @classmethod
+    def from_columns(cls, season, columns):
+        """Build from per-row columns as parsed, the last row winning when a player appears twice in a matchday"""
+        keys, player = np.unique(columns["key"], return_inverse=True)
+        slot = player.astype(np.int64) * (MAX_MATCHDAY + 1) + columns["matchday"]
+        _, last = np.unique(slot[::-1], return_index=True)
+        keep = np.sort(len(slot) - 1 - last)
+        player = player[keep]
+        # Name and team as spelled in each player's last row
+        _, last = np.unique(player[::-1], return_index=True)
+        last = keep[len(keep) - 1 - last]
+        players = {"key": keys, "name": columns["name"][last], "team": columns["team"][last]}
+        rows = {field: column[keep] for field, column in columns.items() if field not in PLAYER_FIELDS}
+        rows["player"] = player.astype(np.int32)
+        return cls(season, players, rows)
+
+    @classmethod
+    def from_file(cls, season, stored):
+        players = {field: stored[field] for field in PLAYER_FIELDS}
+        return cls(season, players, {field: stored[field] for field in stored.files if field not in PLAYER_FIELDS})
+
+    def save(self, file):
+        np.savez(file, **self.players, **self.columns)
+
+    def summary(self, code):
+        totals = self.totals
+        latest = self.latest[code]
+        rows = self.rows
+        rated = int(totals["rated"][code])
+        return {
+            "name": str(self.players["name"][code]),
+            "team": str(self.players["team"][code]),
+            "appearances": int(np.count_nonzero(rows["minutes"][self.starts[code]:self.ends[code]])),
+            **{field: int(totals[field][code]) for field in COUNT_FIELDS},
+            "goals_per_90": _number(self.goals_per_90[code]),
+            "assists_per_90": _number(self.assists_per_90[code]),
+            "penalty_conversion": _number(self.penalty_conversion[code]),
+            "average_rating": _number(totals["rating"][code] / rated) if rated else None,
+            "average_fantasy_points": _number(totals["fantasy_points"][code] / rated) if rated else None,
+            "last5": {
+                "form": _number(rows["form"][latest]),
+                "minutes": int(rows["minutes_last5"][latest]),
+                "goals": int(rows["goals_last5"][latest]),
+                "assists": int(rows["assists_last5"][latest]),
+                "goals_per_90": _number(rows["goals_per_90_last5"][latest]),
+            },
+        }
+
+    def matchdays(self, code):
+        rows = self.rows
+        window = slice(self.starts[code], self.ends[code])
+        columns = {field: rows[field][window].tolist() for field in ("matchday",) + COUNT_FIELDS}
+        floats = {field: rows[field][window] for field in ("rating", "fantasy_points", "form", "goals_per_90_last5")}
+        return [
+            {
+                **{field: values[i] for field, values in columns.items()},
+                **{field: _number(values[i]) for field, values in floats.items()},
+            }
+            for i in range(window.stop - window.start)
+        ]
+
+
+class StatsStore:
+    """Per-season player statistics, one .npz file of columns per season under `directory`.
+
+    Ingesting a file replaces the matchdays it contains, so a whole season and a
+    single matchday load the same way and re-ingesting a file is idempotent. Loaded
+    seasons stay in memory and are reloaded when another process rewrites the file.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._seasons = {}
+        self._lock = threading.Lock()
+
+    def path(self, season):
+        if not SEASON_PATTERN.match(season or ""):
+            raise ValueError("Invalid season: use 1-32 letters, digits, '-' or '_'")
+        return os.path.join(self.directory, f"{season}.npz")
+
+    def seasons(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name[:-4] for name in os.listdir(self.directory) if name.endswith(".npz"))
+
+    def latest_season(self):
+        """The default season: the highest leading year, then the latest ingested (names without a year rank last)"""
+        def order(season):
+            year = SEASON_YEAR.match(season)
+            return int(year.group(1)) if year else -1, os.stat(self.path(season)).st_mtime_ns
+
+        seasons = self.seasons()
+        return max(seasons, key=order) if seasons else None
+
+    def delete(self, season):
+        """Remove a stored season; returns whether it existed"""
+        path = self.path(season)
+        with self._lock:
+            self._seasons.pop(season, None)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                return False
+        return True
+
+    def load(self, season):
+        """The stored SeasonStats, or None if the season was never ingested"""
+        path = self.path(season)
+        try:
+            modified = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        cached = self._seasons.get(season)
+        if cached is not None and cached[0] == modified:
+            return cached[1]
+        with np.load(path, allow_pickle=False) as stored:
+            stats = SeasonStats.from_file(season, stored)
+        self._seasons[season] = (modified, stats)
+        return stats
+
+    def ingest(self, season, rows):
+        """Parse (row_number, dict) rows into `season` and persist it; returns a report like the bulk import"""
+        path = self.path(season)
+        columns, errors = parse_rows(rows)
+        with self._lock:
+            stored = self.load(season)
+            if len(columns["matchday"]) == 0:
+                stats = stored
+            else:
+                stats = stored.merge(columns) if stored is not None else SeasonStats.from_columns(season, columns)
+                os.makedirs(self.directory, exist_ok=True)
+                temporary = f"{path}.{os.getpid()}.tmp"
+                with open(temporary, "wb") as file:
+                    stats.save(file)
+                os.replace(temporary, path)
+                self._seasons[season] = (os.stat(path).st_mtime_ns, stats)
+        return {
+            "season": season,
+            "ingested": int(len(columns["matchday"])),
+            "failed": len(errors),
+            "errors": errors,
+            "rows": len(stats) if stats is not None else 0,
+            "players": len(stats.keys) if stats is not None else 0,
+            "matchdays": sorted(set(stats.rows["matchday"].tolist())) if stats is not None else [],
+        }
+
+    def player_stats(self, name, team, season=None):
+        """Summary and per-matchday rows of one player, or None when there are no stats for them"""
+        season = season or self.latest_season()
+        stats = self.load(season) if season else None
+        code = stats.find(name, team) if stats is not None else None
+        if code is None:
+            return None
+        return {"season": season, "summary": stats.summary(code), "matchdays": stats.matchdays(code)}
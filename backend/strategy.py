@@ -0,0 +1,209 @@
+import math
+import time
+
+import numpy as np
+
+from ledger import ROLES
+
+# Classic fantacalcio roster: 3 goalkeepers, 8 defenders, 8 midfielders, 6 forwards
+DEFAULT_SLOTS = {"portiere": 3, "difensore": 8, "centrocampista": 8, "attaccante": 6}
+
+# Player fields the optimizer reads (used as a Mongo projection)
+STRATEGY_PROJECTION = {
+    "_id": 0, "id": 1, "name": 1, "team": 1, "role": 1, "goals": 1, "assists": 1,
+    "is_penalty_taker": 1, "is_starter": 1, "price_paid": 1, "max_desired_price": 1,
+    "is_primary_choice": 1, "priority_order": 1, "related_to_player_id": 1, "created_at": 1,
+}
+
+
+def player_score(player, weights):
+    """Scalar version of PlayerMatrix.scores for a single player document"""
+    return (weights.get("base", 1.0)
+            + weights.get("goal", 3.0) * (player.get("goals", 0) or 0)
+            + weights.get("assist", 1.0) * (player.get("assists", 0) or 0)
+            + weights.get("penalty", 2.0) * bool(player.get("is_penalty_taker"))
+            + weights.get("starter", 4.0) * bool(player.get("is_starter")))
+
+
+class PlayerMatrix:
+    """Column-oriented view of the candidate players, one NumPy array per attribute"""
+
+    def __init__(self, players):
+        self.players = players
+        n = len(players)
+        self.role = np.fromiter((ROLES.index(p["role"]) if p.get("role") in ROLES else -1 for p in players),
+                                dtype=np.int8, count=n)
+        self.goals = np.fromiter((p.get("goals", 0) or 0 for p in players), dtype=np.float64, count=n)
+        self.assists = np.fromiter((p.get("assists", 0) or 0 for p in players), dtype=np.float64, count=n)
+        self.penalty = np.fromiter((bool(p.get("is_penalty_taker")) for p in players), dtype=bool, count=n)
+        self.starter = np.fromiter((bool(p.get("is_starter")) for p in players), dtype=bool, count=n)
+        self.price_paid = np.fromiter((p.get("price_paid", 0) or 0 for p in players), dtype=np.float64, count=n)
+        self.max_desired = np.fromiter((p.get("max_desired_price", 0) or 0 for p in players), dtype=np.float64, count=n)
+        self.primary = np.fromiter((p.get("is_primary_choice", True) is not False for p in players), dtype=bool, count=n)
+
+    @property
+    def owned(self):
+        """Players already bought (a price was recorded)"""
+        return self.price_paid > 0
+
+    @property
+    def cost(self):
+        """Integer credits each candidate is expected to cost (auctions start at 1)"""
+        return np.maximum(1, np.ceil(self.max_desired)).astype(np.int64)
+
+    def scores(self, weights):
+        return (weights.get("base", 1.0)
+                + weights.get("goal", 3.0) * self.goals
+                + weights.get("assist", 1.0) * self.assists
+                + weights.get("penalty", 2.0) * self.penalty
+                + weights.get("starter", 4.0) * self.starter)
+
+
+def role_knapsack(values, costs, slots, capacity):
+    """Best total value picking at most `slots` items with total cost <= b, for every b <= capacity.
+
+    Returns (best_by_budget, pick) where best_by_budget[b] is the optimum with budget b and
+    pick(b) reconstructs the chosen item indices. The table is updated one item at a time but
+    vectorized over (count, budget), so the cost is O(items) NumPy operations.
+    """
+    capacity = max(0, int(capacity))
+    best = np.full((slots + 1, capacity + 1), -np.inf)
+    best[0, :] = 0.0
+    taken = np.zeros((len(values), slots + 1, capacity + 1), dtype=bool)
+    if slots > 0:
+        for i, (value, cost) in enumerate(zip(values, costs)):
+            if cost > capacity:
+                continue
+            candidate = best[:-1, :capacity + 1 - cost] + value
+            improved = candidate > best[1:, cost:]
+            if improved.any():
+                taken[i, 1:, cost:] = improved
+                best[1:, cost:] = np.where(improved, candidate, best[1:, cost:])
+
+    counts = np.argmax(best, axis=0)
+    best_by_budget = best[counts, np.arange(capacity + 1)]
+
+    def pick(budget):
+        chosen = []
+        k, b = int(counts[budget]), budget
+        for i in range(len(values) - 1, -1, -1):
+            if k == 0:
+                break
+            if taken[i, k, b]:
+                chosen.append(i)
+                b -= int(costs[i])
+                k -= 1
+        return chosen[::-1]
+
+    return best_by_budget, pick
+
+
+def split_total_budget(best_by_role, total_capacity):
+    """Max-plus combination of the per-role curves under the total budget.
+
+    Returns the budget assigned to each role (same order as `best_by_role`).
+    """
+    total_capacity = max(0, int(total_capacity))
+    combined = np.zeros(total_capacity + 1)
+    choices = []
+    for curve in best_by_role:
+        width = min(len(curve) - 1, total_capacity)
+        # options[t, b] = combined[t - b] + curve[b]
+        t = np.arange(total_capacity + 1)[:, None]
+        b = np.arange(width + 1)[None, :]
+        options = np.where(t >= b, combined[np.clip(t - b, 0, None)] + curve[:width + 1][None, :], -np.inf)
+        choice = np.argmax(options, axis=1)
+        combined = options[np.arange(total_capacity + 1), choice]
+        choices.append(choice)
+
+    budgets = []
+    remaining = int(np.argmax(combined))
+    for choice in reversed(choices):
+        spent = int(choice[remaining])
+        budgets.append(spent)
+        remaining -= spent
+    return budgets[::-1]
+
+
+def optimize_squad(players, budget, weights=None, slots=None, primary_only=False):
+    """Best-value squad within each role budget and the total budget.
+
+    Players with a recorded `price_paid` are already owned: they fill slots and
+    consume budget up front. Remaining slots are filled from the other
+    candidates at their `max_desired_price`.
+    """
+    started = time.perf_counter()
+    weights = weights or {}
+    slots = {**DEFAULT_SLOTS, **(slots or {})}
+    matrix = PlayerMatrix(players)
+    scores = matrix.scores(weights)
+    costs = matrix.cost
+    owned = matrix.owned
+    eligible = ~owned & (matrix.role >= 0)
+    if primary_only:
+        eligible &= matrix.primary
+
+    total_left = budget.get("total_budget", 0) - float(matrix.price_paid[owned].sum())
+    curves, pickers, role_indices, role_info = [], [], [], {}
+    for r, role in enumerate(ROLES):
+        owned_idx = np.flatnonzero(owned & (matrix.role == r))
+        spent = float(matrix.price_paid[owned_idx].sum())
+        allocated = budget.get(f"{role}_budget", 0)
+        capacity = math.floor(max(0.0, allocated - spent))
+        open_slots = max(0, slots[role] - len(owned_idx))
+        idx = np.flatnonzero(eligible & (matrix.role == r))
+        curve, pick = role_knapsack(scores[idx], costs[idx], open_slots, capacity)
+        curves.append(curve)
+        pickers.append(pick)
+        role_indices.append(idx)
+        role_info[role] = {"owned": owned_idx, "spent": spent, "allocated": allocated,
+                           "capacity": capacity, "open_slots": open_slots}
+
+    role_budgets = split_total_budget(curves, math.floor(max(0.0, total_left)))
+
+    result_roles = {}
+    total_score = 0.0
+    total_cost = 0.0
+    for r, role in enumerate(ROLES):
+        info = role_info[role]
+        chosen = role_indices[r][pickers[r](role_budgets[r])]
+        squad = []
+        for i in info["owned"]:
+            squad.append(_plan_entry(players[i], scores[i], float(matrix.price_paid[i]), owned=True))
+        for i in chosen:
+            squad.append(_plan_entry(players[i], scores[i], float(costs[i]), owned=False))
+        role_score = sum(p["score"] for p in squad)
+        planned_cost = float(costs[chosen].sum())
+        result_roles[role] = {
+            "allocated": info["allocated"],
+            "spent": info["spent"],
+            "planned_cost": planned_cost,
+            "remaining_after_plan": info["allocated"] - info["spent"] - planned_cost,
+            "slots": slots[role],
+            "open_slots": info["open_slots"],
+            "score": role_score,
+            "players": squad,
+        }
+        total_score += role_score
+        total_cost += info["spent"] + planned_cost
+
+    return {
+        "total_budget": budget.get("total_budget", 0),
+        "total_cost": total_cost,
+        "total_score": total_score,
+        "candidates": int(eligible.sum()),
+        "roles": result_roles,
+        "elapsed_ms": (time.perf_counter() - started) * 1000,
+    }
+
+
+def _plan_entry(player, score, cost, owned):
+    return {
+        "id": player["id"],
+        "name": player.get("name"),
+        "team": player.get("team"),
+        "score": float(score),
+        "cost": cost,
+        "value": float(score) / cost if cost else None,
+        "owned": owned,
+    }
@@ -0,0 +1,919 @@
+import requests
+import sys
+import os
+import json
+import time
+import uuid
+import random
+import argparse
+import csv
+import subprocess
+import tempfile
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+ROLES = ["portiere", "difensore", "centrocampista", "attaccante"]
+SEED_MARKER = "benchmark-seed"
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend')
+
+def synthetic_players(count, league_id="default", seed=42):
+    """Yield `count` reproducible player documents; backups point at an earlier primary of their role"""
+    rng = random.Random(seed)
+    primaries = {role: [] for role in ROLES}
+    for i in range(count):
+        role = ROLES[i % len(ROLES)]
+        is_primary = rng.random() < 0.4 or not primaries[role]
+        player_id = str(uuid.uuid4())
+        related = None
+        if is_primary:
+            primaries[role].append(player_id)
+        elif rng.random() < 0.8:
+            related = rng.choice(primaries[role][-50:])
+        yield {
+            "id": player_id,
+            "name": f"Bench Player {i}",
+            "team": f"Team {i % 20}",
+            "role": role,
+            "goals": rng.randint(0, 25),
+            "assists": rng.randint(0, 15),
+            "is_penalty_taker": rng.random() < 0.1,
+            "is_starter": rng.random() < 0.6,
+            "price_paid": float(rng.randint(0, 40)) if rng.random() < 0.2 else 0.0,
+            "max_desired_price": float(rng.randint(1, 60)),
+            "is_primary_choice": is_primary,
+            "priority_order": 1 if is_primary else rng.randint(2, 4),
+            "related_to_player_id": related,
+            "notes": SEED_MARKER,
+            "league_id": league_id,
+            "version": 1,
+            "created_at": datetime.utcnow(),
+        }
+
+def synthetic_season_csv(path, players=600, matchdays=38, seed=42):
+    """Write a season of per-matchday stat rows (about 80% of players feature each matchday); returns the row count"""
+    rng = random.Random(seed)
+    fields = ["matchday", "name", "team", "minutes", "goals", "assists", "penalties_taken", "penalties_scored",
+              "yellow_cards", "red_cards", "rating"]
+    rows = 0
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(fields)
+        for matchday in range(1, matchdays + 1):
+            for i in range(players):
+                if rng.random() < 0.2:
+                    continue
+                minutes = rng.choice([0, 15, 45, 90, 90, 90])
+                taken = int(rng.random() < 0.05)
+                writer.writerow([matchday, f"Bench Player {i}", f"Team {i % 20}", minutes, int(rng.random() < 0.15),
+                                 int(rng.random() < 0.1), taken, int(taken and rng.random() < 0.8),
+                                 int(rng.random() < 0.1), int(rng.random() < 0.01),
+                                 rng.choice([5, 5.5, 6, 6.5, 7, 7.5]) if minutes else "s.v."])
+                rows += 1
+    return rows
+
+# Run in a fresh interpreter by benchmark_startup; prints the import time of the backend module
+IMPORT_PROBE = """
+import time
+started = time.perf_counter()
+import server
+print((time.perf_counter() - started) * 1000)
+"""
+
+def free_port():
+    import socket
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def resident_memory_mb(pid):
+    """Resident set size of a process (Linux /proc, else psutil when installed), None when unknown"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process(pid).memory_info().rss / (1024 * 1024)
+
+def measure_startup(env, endpoint="api/players/role/portiere", timeout=60):
+    """Launch the backend on uvicorn: (ms until `endpoint` first answers 200, resident MB at that point)"""
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-m", "uvicorn", "server:app", "--port", str(port),
+                                "--log-level", "warning"], cwd=BACKEND_DIR, env=env)
+    try:
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"backend exited with code {process.returncode}")
+            if time.perf_counter() - started > timeout:
+                raise RuntimeError("backend did not answer in time")
+            try:
+                if requests.get(f"http://127.0.0.1:{port}/{endpoint}", timeout=5).status_code == 200:
+                    break
+            except requests.ConnectionError:
+                pass
+            time.sleep(0.005)
+        return (time.perf_counter() - started) * 1000, resident_memory_mb(process.pid)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+class FantasyFootballAPIBenchmark:
+    def __init__(self, base_url=None):
+        self.base_url = base_url or os.environ.get('BACKEND_URL', 'http://localhost:8001')
+        self.mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+        self.session = requests.Session()
+        self.results = {}
+        self._db = None
+
+    @property
+    def db(self):
+        """Direct pymongo handle on the backend database, used for seeding"""
+        if self._db is None:
+            from pymongo import MongoClient
+            self._db = MongoClient(self.mongo_url).fantasy_football
+        return self._db
+
+    def seed_players(self, count, league_id="default"):
+        """Insert `count` synthetic players of a league straight into Mongo, tagged for cleanup"""
+        print(f"\n🌱 Seeding {count} players in league {league_id}...")
+        batch = []
+        for player in synthetic_players(count, league_id):
+            batch.append(player)
+            if len(batch) == 1000:
+                self.db.players.insert_many(batch, ordered=False)
+                batch = []
+        if batch:
+            self.db.players.insert_many(batch, ordered=False)
+
+    def cleanup_seed(self):
+        """Remove every player created by seed_players"""
+        result = self.db.players.delete_many({"notes": SEED_MARKER})
+        print(f"\n🧹 Removed {result.deleted_count} seeded players")
+
+    @staticmethod
+    def percentile(samples, pct):
+        """Nearest-rank percentile of a list of samples"""
+        if not samples:
+            return 0.0
+        ordered = sorted(samples)
+        index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+        return ordered[index]
+
+    def timed_get(self, endpoint, headers=None):
+        """Run a single GET and return its latency in milliseconds"""
+        start = time.perf_counter()
+        response = requests.get(f"{self.base_url}/{endpoint}", headers=headers)
+        elapsed = (time.perf_counter() - start) * 1000
+        if response.status_code != 200:
+            raise RuntimeError(f"{endpoint} returned {response.status_code}")
+        return elapsed
+
+    def run_concurrent(self, name, endpoint, concurrency=50, requests_per_client=20):
+        """Hit an endpoint from `concurrency` parallel clients and record latency percentiles"""
+        print(f"\n⏱️  Benchmarking {name} ({concurrency} clients x {requests_per_client} requests)...")
+
+        def client_loop(_):
+            return [self.timed_get(endpoint) for _ in range(requests_per_client)]
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            samples = [s for batch in pool.map(client_loop, range(concurrency)) for s in batch]
+        wall = time.perf_counter() - start
+
+        result = {
+            "requests": len(samples),
+            "throughput_rps": len(samples) / wall if wall else 0.0,
+            "p50_ms": self.percentile(samples, 50),
+            "p95_ms": self.percentile(samples, 95),
+            "p99_ms": self.percentile(samples, 99),
+        }
+        self.results[name] = result
+        print(f"   {result['requests']} requests, {result['throughput_rps']:.1f} req/s")
+        print(f"   p50={result['p50_ms']:.1f}ms p95={result['p95_ms']:.1f}ms p99={result['p99_ms']:.1f}ms")
+        return result
+
+    def benchmark_league_scaling(self, league_counts=(1, 10, 50), players_per_league=500, samples=100):
+        """Latency of a league-scoped read should stay flat as other leagues are added"""
+        print(f"\n⏱️  League scaling ({players_per_league} players per league)...")
+        seeded = 0
+        for count in league_counts:
+            for index in range(seeded, count):
+                self.seed_players(players_per_league, league_id=f"bench-league-{index}")
+            seeded = max(seeded, count)
+            headers = {"X-League-Id": "bench-league-0"}
+            latencies = [self.timed_get("api/players/role/attaccante", headers=headers) for _ in range(samples)]
+            result = {"leagues": count, "p50_ms": self.percentile(latencies, 50), "p99_ms": self.percentile(latencies, 99)}
+            self.results[f"league scaling: {count} leagues"] = result
+            print(f"   {count} leagues: p50={result['p50_ms']:.1f}ms p99={result['p99_ms']:.1f}ms")
+
+    def benchmark_players_list(self):
+        """p99 latency of /api/players under 50 concurrent clients"""
+        return self.run_concurrent("GET /api/players", "api/players", concurrency=50)
+
+    def benchmark_budget_summary_strategies(self, player_count=10000, iterations=20):
+        """Compare per-role scans summed in Python against the single $group pipeline"""
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+        from ledger import ROLE_TOTALS_PIPELINE
+
+        print(f"\n⏱️  Budget summary strategies on {player_count} players ({iterations} iterations)...")
+        players = self.db.players
+        budgets = self.db.budgets
+
+        def per_role_scans():
+            budgets.find_one({}, {"_id": 0}, sort=[("created_at", -1)])
+            for role in ROLES:
+                rows = list(players.find({"role": role}, {"price_paid": 1, "max_desired_price": 1, "is_primary_choice": 1}))
+                sum(p.get("price_paid", 0) for p in rows)
+                sum(p.get("max_desired_price", 0) for p in rows if p.get("is_primary_choice", True))
+
+        def single_pipeline():
+            budgets.find_one({}, {"_id": 0}, sort=[("created_at", -1)])
+            list(players.aggregate(ROLE_TOTALS_PIPELINE))
+
+        for name, fn, round_trips in (("per-role scans", per_role_scans, 1 + len(ROLES)),
+                                      ("$group pipeline", single_pipeline, 2)):
+            wall_start, cpu_start = time.perf_counter(), time.process_time()
+            for _ in range(iterations):
+                fn()
+            wall = (time.perf_counter() - wall_start) * 1000 / iterations
+            cpu = (time.process_time() - cpu_start) * 1000 / iterations
+            self.results[f"budget summary: {name}"] = {"round_trips": round_trips, "wall_ms": wall, "client_cpu_ms": cpu}
+            print(f"   {name}: {round_trips} round trips, {wall:.1f}ms wall, {cpu:.1f}ms client CPU per call")
+
+        return self.run_concurrent("GET /api/budget/summary", "api/budget/summary", concurrency=10, requests_per_client=10)
+
+    def benchmark_role_grouping(self, primaries=500, backups=2000, iterations=5):
+        """Micro-benchmark of the role ordering: legacy nested scans vs single-pass grouping"""
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+        from server import organize_players_by_role
+        from backend_test import legacy_organize_players_by_role, random_role_players
+
+        print(f"\n⏱️  Role grouping with {primaries} primaries and {backups} backups...")
+        players = random_role_players(random.Random(7), primaries, backups)
+        for name, fn in (("legacy", legacy_organize_players_by_role), ("single-pass", organize_players_by_role)):
+            start = time.perf_counter()
+            for _ in range(iterations):
+                fn(list(players))
+            elapsed = (time.perf_counter() - start) * 1000 / iterations
+            self.results[f"role grouping: {name}"] = {"ms": elapsed}
+            print(f"   {name}: {elapsed:.2f}ms")
+
+    def benchmark_bulk_import(self, count=5000, single_sample=200):
+        """Time a 5k-player CSV import against one POST per player (extrapolated)"""
+        import csv
+        import io
+
+        print(f"\n⏱️  Bulk import of {count} players...")
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(["name", "team", "role", "goals", "assists", "max_desired_price", "notes"])
+        for i in range(count):
+            writer.writerow([f"Bulk Player {i}", f"Team {i % 20}", ROLES[i % len(ROLES)], i % 20, i % 10, i % 50, SEED_MARKER])
+
+        start = time.perf_counter()
+        response = requests.post(f"{self.base_url}/api/players/bulk",
+                                 files={"file": ("players.csv", buffer.getvalue(), "text/csv")})
+        bulk_ms = (time.perf_counter() - start) * 1000
+        report = response.json()
+        print(f"   bulk: {report.get('inserted')} inserted, {report.get('failed')} failed in {bulk_ms:.0f}ms")
+
+        start = time.perf_counter()
+        for i in range(single_sample):
+            requests.post(f"{self.base_url}/api/players", json={
+                "name": f"Single Player {i}", "team": "Team", "role": ROLES[i % len(ROLES)], "notes": SEED_MARKER})
+        single_ms = (time.perf_counter() - start) * 1000 * count / single_sample
+        print(f"   one POST per player: ~{single_ms:.0f}ms for {count} (extrapolated from {single_sample})")
+
+        self.results["bulk import"] = {"players": count, "bulk_ms": bulk_ms, "single_posts_ms_estimate": single_ms}
+        return self.results["bulk import"]
+
+    def benchmark_strategy_optimizer(self, candidates=2000, iterations=20):
+        """In-process latency of the squad optimizer on `candidates` players (target < 100ms)"""
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+        from strategy import optimize_squad
+
+        print(f"\n⏱️  Strategy optimizer on {candidates} candidates...")
+        rng = random.Random(11)
+        players = [{
+            "id": str(i), "name": f"Candidate {i}", "team": f"Team {i % 20}", "role": ROLES[i % len(ROLES)],
+            "goals": rng.randint(0, 25), "assists": rng.randint(0, 15),
+            "is_penalty_taker": rng.random() < 0.1, "is_starter": rng.random() < 0.6,
+            "price_paid": 0.0, "max_desired_price": float(rng.randint(1, 60)),
+        } for i in range(candidates)]
+        budget = {"total_budget": 500.0, "portiere_budget": 10.0, "difensore_budget": 90.0,
+                  "centrocampista_budget": 200.0, "attaccante_budget": 200.0}
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            optimize_squad(players, budget)
+            samples.append((time.perf_counter() - start) * 1000)
+        result = {"candidates": candidates, "p50_ms": self.percentile(samples, 50), "p99_ms": self.percentile(samples, 99)}
+        self.results["strategy optimize"] = result
+        print(f"   p50={result['p50_ms']:.1f}ms p99={result['p99_ms']:.1f}ms")
+        return result
+
+    def benchmark_json_serialization(self, players=10000, iterations=10):
+        """Render a 10k-player list the old way (response_model validation + jsonable_encoder + json)
+        against the direct fast path, and show what gzip does to the payload"""
+        sys.path.insert(0, BACKEND_DIR)
+        import gzip
+        from typing import List
+        from fastapi.encoders import jsonable_encoder
+        from pydantic import TypeAdapter
+        from fastjson import GZIP_LEVEL, EncodedJSON, dumps, orjson
+        from server import Player
+
+        print(f"\n⏱️  JSON rendering of {players} players ({'orjson' if orjson else 'stdlib json'})...")
+        docs = list(synthetic_players(players))
+        adapter = TypeAdapter(List[Player])
+
+        def validated_path():
+            json.dumps(jsonable_encoder(adapter.validate_python(docs)), ensure_ascii=False,
+                       allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+        def fast_path():
+            dumps(docs)
+
+        encoded = EncodedJSON(docs)
+        for name, fn in (("response_model + jsonable_encoder", validated_path), ("fast encoder", fast_path),
+                         ("cached rendered body", lambda: encoded.body)):
+            samples = []
+            for _ in range(iterations):
+                start = time.perf_counter()
+                fn()
+                samples.append((time.perf_counter() - start) * 1000)
+            self.results[f"json render: {name}"] = {"players": players, "p50_ms": self.percentile(samples, 50)}
+            print(f"   {name}: p50={self.percentile(samples, 50):.2f}ms")
+
+        start = time.perf_counter()
+        compressed = gzip.compress(encoded.body, compresslevel=GZIP_LEVEL)
+        gzip_ms = (time.perf_counter() - start) * 1000
+        self.results["json render: gzip"] = {"raw_bytes": len(encoded.body), "gzip_bytes": len(compressed), "gzip_ms": gzip_ms}
+        print(f"   gzip level {GZIP_LEVEL}: {len(encoded.body)} -> {len(compressed)} bytes in {gzip_ms:.1f}ms "
+              f"(done once per cache fill)")
+
+    def benchmark_player_search(self, players=50000, iterations=50):
+        """In-process latency of the search index on `players` players (target p99 < 20ms)"""
+        sys.path.insert(0, BACKEND_DIR)
+        from search import PlayerSearchIndex
+
+        print(f"\n⏱️  Player search on {players} players...")
+        rng = random.Random(5)
+        syllables = ["ma", "ri", "lo", "ta", "ne", "gu", "bar", "del", "vic", "os", "im", "hen", "zo", "chi", "ran"]
+        docs = list(synthetic_players(players))
+        for doc in docs:
+            doc["name"] = " ".join("".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))).capitalize()
+                                   for _ in range(2))
+        start = time.perf_counter()
+        index = PlayerSearchIndex()
+        index.load(docs)
+        print(f"   index built in {(time.perf_counter() - start) * 1000:.0f}ms")
+
+        queries = {
+            "prefix": lambda: index.search(q="mari"),
+            "fuzzy": lambda: index.search(q="marilota"),
+            "ranges + flags": lambda: index.search(ranges={"goals": (10, 20), "max_desired_price": (5, 40)},
+                                                   flags={"is_starter": True}, sort="goals"),
+            "team + role by name": lambda: index.search(team="Team 3", role="attaccante", sort="name"),
+            "everything by price": lambda: index.search(sort="max_desired_price", offset=1000),
+        }
+        for name, query in queries.items():
+            samples = []
+            for _ in range(iterations):
+                started = time.perf_counter()
+                query()
+                samples.append((time.perf_counter() - started) * 1000)
+            result = {"players": players, "p50_ms": self.percentile(samples, 50), "p99_ms": self.percentile(samples, 99)}
+            self.results[f"search: {name}"] = result
+            print(f"   {name}: p50={result['p50_ms']:.2f}ms p99={result['p99_ms']:.2f}ms")
+
+    def benchmark_startup(self, players=10000, runs=5):
+        """Fresh backend processes: time to first served request and resident memory.
+
+        Runs on a seeded embedded SQLite file, and on the MongoDB at MONGO_URL when it is reachable.
+        """
+        import asyncio
+        import statistics
+        sys.path.insert(0, BACKEND_DIR)
+        from sqlite_store import SQLiteDatabase
+
+        print(f"\n⏱️  Backend startup with {players} players...")
+        import_ms = statistics.median(
+            float(subprocess.run([sys.executable, "-c", IMPORT_PROBE], cwd=BACKEND_DIR, capture_output=True,
+                                 text=True, check=True, env=dict(os.environ, STORAGE_BACKEND="sqlite")).stdout)
+            for _ in range(runs))
+        print(f"   import server: {import_ms:.0f}ms")
+        self.results["startup: import"] = {"import_ms": import_ms}
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "fantasy_football.db")
+            db = SQLiteDatabase(path)
+            asyncio.run(db.players.insert_many(list(synthetic_players(players))))
+            db.close()
+            stores = {"sqlite": dict(os.environ, STORAGE_BACKEND="sqlite", SQLITE_PATH=path)}
+            try:
+                from pymongo import MongoClient
+
+                MongoClient(self.mongo_url, serverSelectionTimeoutMS=1000).admin.command("ping")
+                # Measured on whatever the database already holds
+                stores["mongodb"] = dict(os.environ, STORAGE_BACKEND="mongo", MONGO_URL=self.mongo_url)
+            except Exception:
+                print("   MongoDB not reachable, measuring the SQLite store only")
+            for store, env in stores.items():
+                # The first start builds indexes and the ledger once; only the starts after it are measured
+                measure_startup(env)
+                samples = [measure_startup(env) for _ in range(runs)]
+                result = {
+                    "players": players,
+                    "time_to_first_request_ms": statistics.median(ms for ms, _ in samples),
+                    "resident_mb": statistics.median(mb for _, mb in samples) if samples[0][1] is not None else None,
+                }
+                self.results[f"startup: {store}"] = result
+                memory = f", {result['resident_mb']:.0f}MB resident" if result["resident_mb"] is not None else ""
+                print(f"   {store}: first request served after {result['time_to_first_request_ms']:.0f}ms{memory}")
+
+    def benchmark_dashboard_load(self, samples=50):
+        """End-to-end latency of the frontend's initial load: the 7-request fan-out vs one /api/dashboard"""
+        print(f"\n⏱️  Dashboard load ({samples} loads each way)...")
+        fan_out = ["api/players", "api/budget", "api/budget/summary"] + [
+            f"api/players/primary/{role}" for role in ("portiere", "difensore", "centrocampista", "attaccante")]
+
+        def load(endpoints):
+            start = time.perf_counter()
+            for endpoint in endpoints:
+                response = self.session.get(f"{self.base_url}/{endpoint}", headers={"Accept-Encoding": "gzip"})
+                if response.status_code != 200:
+                    raise RuntimeError(f"{endpoint} returned {response.status_code}")
+            return (time.perf_counter() - start) * 1000
+
+        def parallel_load(endpoints):
+            # As a browser would, up to 6 connections at once
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=6) as pool:
+                list(pool.map(lambda endpoint: self.timed_get(endpoint, {"Accept-Encoding": "gzip"}), endpoints))
+            return (time.perf_counter() - start) * 1000
+
+        runs = {
+            "7 requests, sequential": lambda: load(fan_out),
+            "7 requests, 6 in parallel": lambda: parallel_load(fan_out),
+            "1 request (/api/dashboard)": lambda: load(["api/dashboard"]),
+        }
+        for name, run in runs.items():
+            run()  # warm the read caches
+            latencies = [run() for _ in range(samples)]
+            result = {"p50_ms": self.percentile(latencies, 50), "p95_ms": self.percentile(latencies, 95)}
+            self.results[f"dashboard load: {name}"] = result
+            print(f"   {name}: p50={result['p50_ms']:.1f}ms p95={result['p95_ms']:.1f}ms")
+
+    def benchmark_stats_ingestion(self, players=600, matchdays=38, lookups=1000):
+        """Whole-season stats file ingestion (target: seconds) and the per-player stats lookup behind the API"""
+        sys.path.insert(0, BACKEND_DIR)
+        from stats import StatsStore
+
+        print(f"\n⏱️  Stats ingestion ({players} players x {matchdays} matchdays)...")
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "season.csv")
+            rows = synthetic_season_csv(path, players, matchdays)
+            store = StatsStore(os.path.join(directory, "stats"))
+            for label in ("first ingest", "re-ingest"):
+                start = time.perf_counter()
+                with open(path, newline="") as file:
+                    report = store.ingest("2024-25", enumerate(csv.DictReader(file), start=1))
+                elapsed = time.perf_counter() - start
+                self.results[f"stats ingestion: {label}"] = {"rows": rows, "seconds": elapsed,
+                                                             "rows_per_second": rows / elapsed}
+                print(f"   {label}: {report['ingested']} rows in {elapsed * 1000:.0f}ms ({rows / elapsed:,.0f} rows/s)")
+
+            # A fresh store reads the season file back, as another worker process would
+            start = time.perf_counter()
+            fresh = StatsStore(store.directory)
+            fresh.load("2024-25")
+            print(f"   season file loaded in {(time.perf_counter() - start) * 1000:.1f}ms")
+            samples = []
+            for i in range(lookups):
+                started = time.perf_counter()
+                fresh.player_stats(f"Bench Player {i % players}", f"Team {i % players % 20}")
+                samples.append((time.perf_counter() - started) * 1000)
+            result = {"p50_ms": self.percentile(samples, 50), "p99_ms": self.percentile(samples, 99)}
+            self.results["stats lookup"] = result
+            print(f"   player stats lookup: p50={result['p50_ms']:.2f}ms p99={result['p99_ms']:.2f}ms")
+
+    def benchmark_audit_log(self, writers=200, writes_per_writer=20, replay_events=500000):
+        """Audit log append latency with group commit vs one fsync per event, and replay speed (target > 50k events/s)"""
+        sys.path.insert(0, BACKEND_DIR)
+        import asyncio
+        from audit import AuditLog, read_events, replay
+
+        print(f"\n⏱️  Audit log ({writers} concurrent writers, {replay_events} events replayed)...")
+        docs = list(synthetic_players(1000))
+
+        def event(i):
+            return {"type": "player", "op": "updated", "league_id": "default", "player": docs[i % len(docs)]}
+
+        with tempfile.TemporaryDirectory() as directory:
+            async def run_writers(log):
+                latencies = []
+
+                async def writer(offset):
+                    for i in range(writes_per_writer):
+                        started = time.perf_counter()
+                        await log.append(event(offset + i))
+                        latencies.append((time.perf_counter() - started) * 1000)
+
+                started = time.perf_counter()
+                await asyncio.gather(*(writer(w * writes_per_writer) for w in range(writers)))
+                return latencies, time.perf_counter() - started
+
+            class FsyncPerEvent(AuditLog):
+                """Baseline without group commit: each append is written and fsynced on its own"""
+
+                def _run(self):
+                    while True:
+                        with self._condition:
+                            while not self._pending and not self._closing:
+                                self._condition.wait()
+                            if not self._pending:
+                                return
+                            chunk, future, loop = self._pending.pop(0)
+                        self._file.write(chunk)
+                        self._file.flush()
+                        os.fsync(self._file.fileno())
+                        self.writes += 1
+                        loop.call_soon_threadsafe(future.set_result, None)
+
+            for name, log_class in (("group commit", AuditLog), ("fsync per event", FsyncPerEvent)):
+                log = log_class(os.path.join(directory, f"{name}.log"))
+                log.open()
+                latencies, wall = asyncio.run(run_writers(log))
+                log.close()
+                result = {"events": len(latencies), "fsyncs": log.writes, "events_per_second": len(latencies) / wall,
+                          "p50_ms": self.percentile(latencies, 50), "p99_ms": self.percentile(latencies, 99)}
+                self.results[f"audit log: {name}"] = result
+                print(f"   {name}: {result['events_per_second']:,.0f} events/s, {result['fsyncs']} fsyncs, "
+                      f"p50={result['p50_ms']:.2f}ms p99={result['p99_ms']:.2f}ms")
+
+            path = os.path.join(directory, "replay.log")
+            log = AuditLog(path, fsync=False)
+            log.open()
+
+            async def fill():
+                for start in range(0, replay_events, 1000):
+                    await log.append(*(event(i) for i in range(start, min(start + 1000, replay_events))))
+
+            asyncio.run(fill())
+            log.close()
+            started = time.perf_counter()
+            state = replay(read_events([path]))
+            elapsed = time.perf_counter() - started
+            result = {"events": state["events"], "seconds": elapsed, "events_per_second": state["events"] / elapsed}
+            self.results["audit log: replay"] = result
+            print(f"   replay: {state['events']} events in {elapsed:.2f}s ({result['events_per_second']:,.0f} events/s)")
+
+    def benchmark_metrics_overhead(self, iterations=20000, samples=200):
+        """Cost of the request metrics middleware compared with a /api/players round trip (target < 1%)"""
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+        import asyncio
+        from metrics import Gauge, Histogram, RequestMetricsMiddleware
+
+        print(f"\n⏱️  Metrics middleware overhead ({iterations} in-process requests)...")
+
+        class Route:
+            path = "/api/players"
+
+        async def endpoint(scope, receive, send):
+            scope["route"] = Route
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"[]"})
+
+        async def noop_send(message):
+            pass
+
+        async def run(app):
+            scope = {"type": "http", "path": "/api/players", "method": "GET"}
+            start = time.perf_counter()
+            for _ in range(iterations):
+                await app(dict(scope), None, noop_send)
+            return (time.perf_counter() - start) / iterations * 1e6
+
+        wrapped = RequestMetricsMiddleware(endpoint, Histogram("d", "", ["route", "method", "status"]), Gauge("f", ""))
+        bare_us = asyncio.run(run(endpoint))
+        wrapped_us = asyncio.run(run(wrapped))
+        overhead_us = max(0.0, wrapped_us - bare_us)
+        request_ms = self.percentile([self.timed_get("api/players") for _ in range(samples)], 50)
+        result = {"overhead_us": overhead_us, "players_p50_ms": request_ms,
+                  "overhead_pct": overhead_us / 1000 / request_ms * 100 if request_ms else 0.0}
+        self.results["metrics overhead"] = result
+        print(f"   {overhead_us:.1f}us per request vs /api/players p50 {request_ms:.2f}ms "
+              f"({result['overhead_pct']:.3f}%)")
+        return result
+
+# ---------------------------------------------------------------------------
+# Local load-test suite: a fresh uvicorn process per dataset size, seeded with
+# synthetic players, every endpoint hit by concurrent clients, results saved as
+# JSON so two commits can be compared with --compare.
+# ---------------------------------------------------------------------------
+
+SUITE_SIZES = (1000, 10000, 100000)
+
+def use_mongomock(server):
+    """Point every collection the backend holds at an in-memory mongomock database"""
+    import mongomock_motor
+
+    server.bind_collections(mongomock_motor.AsyncMongoMockClient().fantasy_football)
+
+def serve_local(port, players, store):
+    """Run the backend on uvicorn with `players` seeded players (entry point of the `serve` command)"""
+    sys.path.insert(0, BACKEND_DIR)
+    run_directory = tempfile.mkdtemp(prefix="benchmark-")
+    # Benchmark writes must not land in the real audit log
+    os.environ.setdefault("AUDIT_LOG_PATH", os.path.join(run_directory, "audit.log"))
+    if store == "sqlite":
+        # A fresh embedded database per run; must be chosen before the backend is imported
+        os.environ["STORAGE_BACKEND"] = "sqlite"
+        os.environ["SQLITE_PATH"] = os.path.join(run_directory, "fantasy_football.db")
+    from contextlib import asynccontextmanager
+    import uvicorn
+    import server
+
+    if store == "mongomock":
+        use_mongomock(server)
+    backend_lifespan = server.app.router.lifespan_context
+
+    async def seed():
+        batch = []
+        for player in synthetic_players(players):
+            batch.append(player)
+            if len(batch) == 5000:
+                await server.players_collection.insert_many(batch, ordered=False)
+                batch = []
+        if batch:
+            await server.players_collection.insert_many(batch, ordered=False)
+        await server.budget_ledger.rebuild()
+        server.read_cache.clear()
+
+    async def cleanup():
+        if store == "mongodb":
+            await server.players_collection.delete_many({"notes": SEED_MARKER})
+            await server.budget_ledger.rebuild()
+
+    @asynccontextmanager
+    async def lifespan(app):
+        # Seeding runs inside the backend's own lifespan, after storage is open
+        async with backend_lifespan(app):
+            await seed()
+            try:
+                yield
+            finally:
+                await cleanup()
+
+    server.app.router.lifespan_context = lifespan
+    uvicorn.run(server.app, host="127.0.0.1", port=port, log_level="warning")
+
+def get_scenario(path):
+    def make_client(session, base_url):
+        return lambda: session.get(f"{base_url}/{path}")
+    return make_client
+
+def create_player_scenario(session, base_url):
+    counter = iter(range(10 ** 9))
+
+    def call():
+        i = next(counter)
+        return session.post(f"{base_url}/api/players", json={
+            "name": f"Load Player {i}", "team": "Team", "role": ROLES[i % len(ROLES)], "notes": SEED_MARKER})
+    return call
+
+def bid_scenario(session, base_url):
+    """Each client bids on its own player, so the numbers measure the write path rather than contention"""
+    player = session.post(f"{base_url}/api/players", json={
+        "name": "Load Bid Player", "team": "Team", "role": "difensore", "notes": SEED_MARKER}).json()
+    state = {"version": player["version"], "price": 0}
+
+    def call():
+        state["price"] += 1
+        response = session.patch(f"{base_url}/api/players/{player['id']}/bid",
+                                 json={"price_paid": float(state["price"]), "version": state["version"]})
+        if response.status_code == 200:
+            state["version"] = response.json()["version"]
+        return response
+    return call
+
+def update_budget_scenario(session, base_url):
+    def call():
+        return session.put(f"{base_url}/api/budget", json={
+            "total_budget": 500.0, "portiere_budget": 10.0, "difensore_budget": 90.0,
+            "centrocampista_budget": 200.0, "attaccante_budget": 200.0})
+    return call
+
+def optimize_scenario(session, base_url):
+    return lambda: session.post(f"{base_url}/api/strategy/optimize", json={})
+
+# (name, heavy, make_client). Heavy scenarios move the whole dataset per request and get
+# a lighter load. Reads come first; writes last since they invalidate the read caches.
+SUITE_SCENARIOS = [
+    ("GET /api/health", False, get_scenario("api/health")),
+    ("GET /api/players", True, get_scenario("api/players")),
+    ("GET /api/players?limit=100", False, get_scenario("api/players?limit=100")),
+    ("GET /api/players?format=ndjson", True, get_scenario("api/players?format=ndjson")),
+    ("GET /api/players/role/{role}", False, get_scenario("api/players/role/attaccante")),
+    ("GET /api/players/primary/{role}", False, get_scenario("api/players/primary/attaccante")),
+    ("GET /api/players/export?format=csv", True, get_scenario("api/players/export?format=csv")),
+    ("GET /api/players/search", False, get_scenario("api/players/search?q=bench&goals_min=5&is_starter=true")),
+    ("GET /api/budget", False, get_scenario("api/budget")),
+    ("GET /api/budget/summary", False, get_scenario("api/budget/summary")),
+    ("GET /api/budget/history", False, get_scenario("api/budget/history")),
+    ("GET /api/dashboard", True, get_scenario("api/dashboard")),
+    ("GET /api/strategy/next", False, get_scenario("api/strategy/next")),
+    ("POST /api/strategy/optimize", True, optimize_scenario),
+    ("GET /api/cache/stats", False, get_scenario("api/cache/stats")),
+    ("GET /api/metrics", False, get_scenario("api/metrics")),
+    ("POST /api/players", False, create_player_scenario),
+    ("PATCH /api/players/{id}/bid", False, bid_scenario),
+    ("PUT /api/budget", False, update_budget_scenario),
+]
+
+def run_load(base_url, make_client, concurrency, requests_per_client):
+    """Drive one scenario from `concurrency` keep-alive clients; latency percentiles in ms"""
+    def client_loop(_):
+        session = requests.Session()
+        call = make_client(session, base_url)
+        samples, errors = [], 0
+        for _ in range(requests_per_client):
+            start = time.perf_counter()
+            response = call()
+            # Drain streamed bodies so the full transfer is timed
+            response.content
+            samples.append((time.perf_counter() - start) * 1000)
+            errors += response.status_code >= 400
+        return samples, errors
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(client_loop, range(concurrency)))
+    wall = time.perf_counter() - start
+    samples = [sample for batch, _ in outcomes for sample in batch]
+    percentile = FantasyFootballAPIBenchmark.percentile
+    return {
+        "requests": len(samples),
+        "errors": sum(errors for _, errors in outcomes),
+        "throughput_rps": len(samples) / wall if wall else 0.0,
+        "p50_ms": percentile(samples, 50),
+        "p95_ms": percentile(samples, 95),
+        "p99_ms": percentile(samples, 99),
+    }
+
+def wait_until_ready(base_url, process, timeout=900):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"backend exited with code {process.returncode}")
+        try:
+            if requests.get(f"{base_url}/api/health", timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("backend did not become ready in time")
+
+def current_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def run_suite(args):
+    results = {
+        "commit": current_commit(),
+        "created_at": datetime.utcnow().isoformat(),
+        "store": args.store,
+        "concurrency": args.concurrency,
+        "requests_per_client": args.requests,
+        "sizes": {},
+    }
+    for size in args.sizes:
+        print(f"\n📦 {size} players ({args.store})")
+        port = args.port
+        env = dict(os.environ, READ_CACHE_TTL_SECONDS=os.environ.get('READ_CACHE_TTL_SECONDS', '30'))
+        process = subprocess.Popen([sys.executable, os.path.abspath(__file__), "serve", "--port", str(port),
+                                    "--players", str(size), "--store", args.store], env=env)
+        base_url = f"http://127.0.0.1:{port}"
+        try:
+            started = time.perf_counter()
+            wait_until_ready(base_url, process)
+            print(f"   backend ready in {time.perf_counter() - started:.1f}s")
+            size_results = {}
+            for name, heavy, make_client in SUITE_SCENARIOS:
+                if args.only and not any(token in name for token in args.only):
+                    continue
+                concurrency = min(args.concurrency, 4) if heavy else args.concurrency
+                per_client = max(1, args.requests // 5) if heavy else args.requests
+                result = run_load(base_url, make_client, concurrency, per_client)
+                size_results[name] = result
+                print(f"   {name:<38} {result['throughput_rps']:8.1f} req/s  p50={result['p50_ms']:7.1f}ms "
+                      f"p95={result['p95_ms']:7.1f}ms p99={result['p99_ms']:7.1f}ms"
+                      + (f"  ({result['errors']} errors)" if result['errors'] else ""))
+            results["sizes"][str(size)] = size_results
+        finally:
+            process.terminate()
+            process.wait(timeout=60)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Results saved to {args.output}")
+    if args.compare:
+        compare_results(args.compare, results)
+    return 0
+
+def compare_results(baseline_path, results):
+    """Print p99 and throughput changes against a previous results file"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\n📊 Compared with {baseline_path} (commit {baseline.get('commit')})")
+    for size, scenarios in results["sizes"].items():
+        for name, result in scenarios.items():
+            before = baseline.get("sizes", {}).get(size, {}).get(name)
+            if not before:
+                continue
+            p99_change = (result["p99_ms"] / before["p99_ms"] - 1) * 100 if before["p99_ms"] else 0.0
+            rps_change = (result["throughput_rps"] / before["throughput_rps"] - 1) * 100 if before["throughput_rps"] else 0.0
+            flag = "⚠️ " if p99_change > 10 else "   "
+            print(f"{flag}{size:>7} {name:<38} p99 {p99_change:+6.1f}%  throughput {rps_change:+6.1f}%")
+
+def parse_suite_args(argv):
+    parser = argparse.ArgumentParser(prog="backend_benchmark.py suite",
+                                     description="Load-test a local backend at several dataset sizes")
+    parser.add_argument("--sizes", type=lambda value: [int(v) for v in value.split(",")], default=list(SUITE_SIZES))
+    parser.add_argument("--store", choices=["mongomock", "sqlite", "mongodb"], default="mongomock",
+                        help="in-memory mongomock, a temporary embedded SQLite file, or the MongoDB at MONGO_URL "
+                             "(seeded players are removed afterwards)")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=25, help="requests per client")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--only", nargs="*", help="only scenarios whose name contains one of these strings")
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--compare", help="previous results file to compare against")
+    return parser.parse_args(argv)
+
+def parse_serve_args(argv):
+    parser = argparse.ArgumentParser(prog="backend_benchmark.py serve")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--players", type=int, default=1000)
+    parser.add_argument("--store", choices=["mongomock", "sqlite", "mongodb"], default="mongomock")
+    return parser.parse_args(argv)
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "suite":
+        return run_suite(parse_suite_args(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        args = parse_serve_args(sys.argv[2:])
+        serve_local(args.port, args.players, args.store)
+        return 0
+
+    print("🚀 Starting Fantasy Football API Benchmarks")
+    print("=" * 50)
+
+    base_url = sys.argv[1] if len(sys.argv) > 1 else None
+    bench = FantasyFootballAPIBenchmark(base_url)
+    print(f"   Target: {bench.base_url}")
+
+    try:
+        bench.benchmark_role_grouping()
+        bench.benchmark_strategy_optimizer()
+        bench.benchmark_json_serialization()
+        bench.benchmark_player_search()
+        bench.benchmark_stats_ingestion()
+        bench.benchmark_audit_log()
+        bench.benchmark_players_list()
+        bench.benchmark_metrics_overhead()
+        bench.benchmark_startup()
+
+        bench.seed_players(10000)
+        try:
+            bench.benchmark_budget_summary_strategies(10000)
+            bench.benchmark_dashboard_load()
+            bench.benchmark_bulk_import(5000)
+            bench.run_concurrent("GET /api/strategy/next", "api/strategy/next", concurrency=10, requests_per_client=50)
+            bench.benchmark_league_scaling()
+        finally:
+            bench.cleanup_seed()
+    except KeyboardInterrupt:
+        print("\n⚠️ Benchmark interrupted by user")
+        return 1
+    except Exception as e:
+        print(f"\n💥 Unexpected error: {str(e)}")
+        return 1
+
+    print("\n" + "=" * 50)
+    print("📊 Run this script against the previous and current build to compare results.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
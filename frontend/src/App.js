@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { Tabs, TabsContent, TabsList, TabsTrigger } from './components/ui/tabs';
 import { Card, CardContent, CardHeader, CardTitle } from './components/ui/card';
 import { Button } from './components/ui/button';
@@ -23,7 +23,10 @@ function App() {
   const [showAddPlayer, setShowAddPlayer] = useState(false);
   const [showBudgetDialog, setShowBudgetDialog] = useState(false);
   const [editingPlayer, setEditingPlayer] = useState(null);
+  const [editConflict, setEditConflict] = useState(false);
   const [loading, setLoading] = useState(true);
+  // True while the server change feed is connected: writes then arrive as pushed deltas
+  const liveFeed = useRef(false);
 
   const roles = [
     { key: 'portiere', label: 'Portieri', icon: Target },
@@ -58,41 +61,89 @@ function App() {
 
   // Fetch data
   useEffect(() => {
-    fetchPlayers();
-    fetchBudget();
-    fetchBudgetSummary();
-    fetchPrimaryPlayers();
+    fetchDashboard();
   }, []);
 
-  // Fetch primary players when active tab changes
+  // Subscribe to the server change feed and apply pushed deltas instead of refetching
   useEffect(() => {
-    fetchPrimaryPlayersForRole(activeTab);
-  }, [activeTab]);
+    const source = new EventSource(`${API_BASE_URL}/api/events`);
+    let dropped = false;
+    source.onopen = () => {
+      liveFeed.current = true;
+      // Changes made while the feed was down were never pushed: reload once on reconnect
+      if (dropped) {
+        dropped = false;
+        fetchDashboard();
+      }
+    };
+    source.onerror = () => {
+      liveFeed.current = false;
+      dropped = true;
+    };
+    source.onmessage = (message) => {
+      const event = JSON.parse(message.data);
+      if (event.type === 'player') {
+        applyPlayerChange(event);
+        fetchBudgetSummary();
+      } else if (event.type === 'budget') {
+        setBudget(event.budget);
+        setBudgetForm(event.budget);
+        fetchBudgetSummary();
+      } else if (event.type === 'resync') {
+        fetchDashboard();
+      }
+    };
+    return () => source.close();
+  }, []);
 
-  const fetchPrimaryPlayers = async () => {
-    const roles = ['portiere', 'difensore', 'centrocampista', 'attaccante'];
-    for (const role of roles) {
-      await fetchPrimaryPlayersForRole(role);
-    }
+  const applyPlayerChange = (event) => {
+    const removedId = event.op === 'deleted' ? event.id : event.player.id;
+    setPlayers(prev => {
+      const rest = prev.filter(p => p.id !== removedId);
+      return event.op === 'deleted' ? rest : [...rest, event.player].sort((a, b) =>
+        (a.created_at || '').localeCompare(b.created_at || ''));
+    });
+    setPrimaryPlayers(prev => {
+      const next = {};
+      for (const [role, list] of Object.entries(prev)) {
+        next[role] = list.filter(p => p.id !== removedId);
+      }
+      if (event.op !== 'deleted' && event.player.is_primary_choice) {
+        const { id, name, team, role } = event.player;
+        next[role] = [...(next[role] || []), { id, name, team }];
+      }
+      return next;
+    });
   };
 
-  const fetchPrimaryPlayersForRole = async (role) => {
-    try {
-      const response = await fetch(`${API_BASE_URL}/api/players/primary/${role}`);
-      const data = await response.json();
-      setPrimaryPlayers(prev => ({...prev, [role]: data}));
-    } catch (error) {
-      console.error(`Error fetching primary players for ${role}:`, error);
+  // Without the live feed, refresh the active role when its tab is opened
+  useEffect(() => {
+    if (!loading && !liveFeed.current) {
+      fetchDashboard([activeTab]);
     }
-  };
+  }, [activeTab]);
 
-  const fetchPlayers = async () => {
+  // Players, primary choices, budget and summary in one request; with `roles`, only those roles are replaced
+  const fetchDashboard = async (roles = null) => {
     try {
-      const response = await fetch(`${API_BASE_URL}/api/players`);
+      const query = roles ? `?roles=${roles.join(',')}` : '';
+      const response = await fetch(`${API_BASE_URL}/api/dashboard${query}`);
       const data = await response.json();
-      setPlayers(data);
+      if (roles) {
+        setPlayers(prev => [...prev.filter(p => !roles.includes(p.role)), ...data.players].sort((a, b) =>
+          (a.created_at || '').localeCompare(b.created_at || '')));
+        setPrimaryPlayers(prev => ({...prev, ...data.primary_players}));
+      } else {
+        setPlayers(data.players);
+        setPrimaryPlayers(data.primary_players);
+        setBudgetForm(data.budget);
+      }
+      setBudget(data.budget);
+      setBudgetSummary(data.budget_summary);
     } catch (error) {
-      console.error('Error fetching players:', error);
+      console.error('Error fetching dashboard:', error);
+    } finally {
+      setLoading(false);
     }
   };
 
@@ -128,9 +179,9 @@ function App() {
         body: JSON.stringify(newPlayer)
       });
       if (response.ok) {
-        await fetchPlayers();
-        await fetchBudgetSummary();
-        await fetchPrimaryPlayersForRole(newPlayer.role);
+        if (!liveFeed.current) {
+          await fetchDashboard([newPlayer.role]);
+        }
         setNewPlayer({
           name: '',
           team: '',
@@ -163,26 +214,40 @@ function App() {
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify(editingPlayer)
       });
+      if (response.status === 409) {
+        // Someone bid on or edited the player since the form opened: show their version before saving over it
+        const latest = await fetch(`${API_BASE_URL}/api/players/${editingPlayer.id}`);
+        if (latest.ok) {
+          setEditingPlayer(await latest.json());
+          setEditConflict(true);
+        }
+        return;
+      }
       if (response.ok) {
-        await fetchPlayers();
-        await fetchBudgetSummary();
-        await fetchPrimaryPlayersForRole(editingPlayer.role);
-        setEditingPlayer(null);
+        if (!liveFeed.current) {
+          const previousRole = players.find(p => p.id === editingPlayer.id)?.role;
+          await fetchDashboard([...new Set([previousRole, editingPlayer.role].filter(Boolean))]);
+        }
+        closeEditDialog();
       }
     } catch (error) {
       console.error('Error updating player:', error);
     }
   };
 
+  const closeEditDialog = () => {
+    setEditingPlayer(null);
+    setEditConflict(false);
+  };
+
   const handleDeletePlayer = async (playerId) => {
     try {
       const response = await fetch(`${API_BASE_URL}/api/players/${playerId}`, {
         method: 'DELETE'
       });
-      if (response.ok) {
-        await fetchPlayers();
-        await fetchBudgetSummary();
-        await fetchPrimaryPlayersForRole(players.find(p => p.id === playerId)?.role);
+      if (response.ok && !liveFeed.current) {
+        const role = players.find(p => p.id === playerId)?.role;
+        await fetchDashboard(role ? [role] : null);
       }
     } catch (error) {
       console.error('Error deleting player:', error);
@@ -198,8 +263,10 @@ function App() {
         body: JSON.stringify(budgetForm)
       });
       if (response.ok) {
-        await fetchBudget();
-        await fetchBudgetSummary();
+        if (!liveFeed.current) {
+          await fetchBudget();
+          await fetchBudgetSummary();
+        }
         setShowBudgetDialog(false);
       }
     } catch (error) {
@@ -447,17 +514,22 @@ function App() {
         </Tabs>
 
         {/* Edit Player Dialog */}
-        <Dialog open={!!editingPlayer} onOpenChange={() => setEditingPlayer(null)}>
+        <Dialog open={!!editingPlayer} onOpenChange={closeEditDialog}>
           <DialogContent className="sm:max-w-md">
             <DialogHeader>
               <DialogTitle>Modifica Giocatore</DialogTitle>
             </DialogHeader>
+            {editConflict && (
+              <p className="text-sm text-red-600">
+                Il giocatore è stato modificato nel frattempo: i dati sono stati ricaricati, controllali e salva di nuovo.
+              </p>
+            )}
             {editingPlayer && (
               <PlayerForm 
                 player={editingPlayer}
                 setPlayer={setEditingPlayer}
                 onSubmit={handleUpdatePlayer}
-                onCancel={() => setEditingPlayer(null)}
+                onCancel={closeEditDialog}
                 isEditing={true}
                 primaryPlayers={primaryPlayers}
                 role={editingPlayer.role}